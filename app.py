@@ -1,18 +1,182 @@
-from flask import Flask, render_template, request, jsonify
-from utils.parser import extract_schedule
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context, url_for
+from utils import metrics
+from utils.parser import (PARSER_VERSION, DEBUG_MATCHING, check_availability, iter_availability,
+                          parse_exams_docx, time_to_min)
+from utils.cache import ParseCache
+from utils.conflicts import CONFLICT_KINDS, find_conflicts
+from utils.export import EXPORT_FORMATS, iter_export
+from utils.jobs import JobManager
+from utils.model import Exam, WEEKDAY_KEYS, min_to_time
+from utils.store import DoctorsStore
+from utils.uploads import Upload, SPOOL_THRESHOLD
+import json
+import logging
 import os
+import re
+import time
 
 app = Flask(__name__)
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+# Uploads are parsed from memory; above this size they are spooled to an anonymous temp file
+app.config['UPLOAD_SPOOL_BYTES'] = int(os.environ.get('UPLOAD_SPOOL_BYTES', SPOOL_THRESHOLD))
+# Processes used to parse large doctor PDFs (1 = serial)
+app.config['PDF_PARSE_WORKERS'] = int(os.environ.get('PDF_PARSE_WORKERS', 1))
+# Upper bound on the time_budget a client may ask /assign for
+app.config['ASSIGN_MAX_SECONDS'] = float(os.environ.get('ASSIGN_MAX_SECONDS', 30))
+
+# Parsed exam files keyed by file hash, so re-uploading the same file skips parsing
+parse_cache = ParseCache(
+    os.environ.get('PARSE_CACHE_DIR', 'cache'),
+    PARSER_VERSION,
+    max_memory_bytes=int(os.environ.get('PARSE_CACHE_MEMORY_MB', 64)) * 1024 * 1024,
+    max_disk_bytes=int(os.environ.get('PARSE_CACHE_DISK_MB', 512)) * 1024 * 1024,
+)
+
+# The last uploaded doctors schedule. Only changed PDF pages are re-parsed, and exams
+# can be matched against it without uploading the PDF again.
+doctors_store = DoctorsStore(os.environ.get('DOCTORS_DB', 'doctors.sqlite3'), PARSER_VERSION)
+
+# Background parse jobs (POST /jobs, GET /jobs/<id>). JOB_EXECUTOR is "thread" or "process".
+jobs = JobManager(
+    os.environ.get('JOBS_DIR', 'jobs'),
+    executor=os.environ.get('JOB_EXECUTOR', 'thread'),
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+)
+
+# One JSON line per request: status, duration and the per-stage timings/counts of its trace
+request_log = logging.getLogger('schedule.requests')
+if not request_log.handlers:
+    request_log.addHandler(logging.StreamHandler())
+    request_log.setLevel(logging.INFO)
+
+@app.before_request
+def start_request_trace():
+    g.trace = metrics.start_trace(request.endpoint or 'unknown')
+
+@app.after_request
+def remember_status(response):
+    g.status = response.status_code
+    return response
+
+@app.teardown_request
+def log_request_trace(exc):
+    # A streamed response tears down once when the view returns and again when the
+    # stream ends; log it (with its matching) the second time
+    if g.get('streaming') and not g.get('stream_done'):
+        return
+    trace = g.pop('trace', None)
+    if trace is None:
+        return
+    status = g.pop('status', 500)
+    seconds = time.perf_counter() - trace.started
+    metrics.REGISTRY.observe('request_seconds', seconds, endpoint=trace.name, status=status)
+    metrics.end_trace()
+    if trace.name != 'metrics_endpoint':
+        request_log.info(json.dumps({'method': request.method, 'path': request.path, 'status': status,
+                                     **trace.to_dict()}, ensure_ascii=False))
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def process_uploads(pdf_uploads=(), docx_uploads=(), progress=None):
+    """
+    Parses the uploaded files (lists of Upload objects) and matches exams to doctors.
+    Several PDFs are merged into one doctors schedule, and the exams of every DOCX are
+    matched against it in one pass. Without a PDF, exams are matched against the stored
+    doctors schedule, if there is one.
+    Returns the `data` dict of the /parse response. Also run as a background job.
+    """
+    data = {}
+    snapshot = None  # (version, DoctorsDB) this request matches against
+    files = []
+    spans = []  # (start, end) minutes of each exam, straight from the Exam records
+
+    try:
+        # Process PDFs (Doctors)
+        if pdf_uploads:
+            snapshot, files = _load_doctors(pdf_uploads, progress)
+            data['doctors'] = snapshot[1].to_dict()
+
+        # Process Docx files (Exams)
+        if docx_uploads:
+            data['exams'] = []
+            for upload in docx_uploads:
+                exams = _load_exams(upload)
+                data['exams'].extend(_exam_dicts(exams, upload))
+                spans.extend((exam.start, exam.end) for exam in exams)
+                files.append({'kind': 'docx', 'filename': upload.filename, 'digest': upload.digest,
+                              'exams': len(exams)})
+    finally:
+        for upload in [*pdf_uploads, *docx_uploads]:
+            upload.close()
+
+    # Room double-bookings and overlapping sittings, indexes into data['exams']
+    if 'exams' in data:
+        with metrics.stage('conflicts'):
+            data['conflicts'] = find_conflicts(data['exams'])
+
+    if snapshot is None and 'exams' in data:
+        snapshot = doctors_store.snapshot()
+        if len(snapshot[1]):
+            data['doctors'] = snapshot[1].to_dict()
+        else:
+            snapshot = None  # No PDF uploaded yet
+
+    # If both exist, perform matching, on the index of the very schedule in the
+    # response (the store's shared one unless another upload has replaced it since)
+    if snapshot is not None and 'exams' in data:
+        data['matches'] = check_availability(data['exams'], doctors_store.busy_index(snapshot),
+                                             progress=progress, spans=spans)
+
+    data['files'] = files
+    return data
+
+def _load_doctors(pdf_uploads, progress=None):
+    """
+    Makes the uploaded PDFs (merged) the stored schedule, parsing only new pages.
+    Returns the (version, DoctorsDB) it committed, with one provenance entry per PDF.
+    """
+    result = doctors_store.update_from_pdfs([upload.file for upload in pdf_uploads],
+                                            [upload.digest for upload in pdf_uploads],
+                                            workers=app.config['PDF_PARSE_WORKERS'], progress=progress)
+    files = [{'kind': 'pdf', 'filename': upload.filename, 'digest': upload.digest, **info}
+             for upload, info in zip(pdf_uploads, result['files'])]
+    return (result['version'], result['db']), files
+
+def _load_exams(docx_upload):
+    # Exam records for an uploaded DOCX, from the parse cache when possible
+    def parse_docx():
+        return [Exam.from_dict(exam) for exam in parse_exams_docx(docx_upload.file)]
+
+    return parse_cache.get_or_parse('docx', docx_upload.digest, parse_docx)
+
+def _exam_dicts(exams, upload):
+    # Exam dicts tagged with the file they came from
+    return (dict(exam.to_dict(), source=upload.filename) for exam in exams)
+
+def _read_uploads():
+    """
+    Lists of Upload objects for the pdf_file / docx_file fields (each may be repeated),
+    read straight from the request without going through the filesystem. The same
+    file sent twice is only kept once.
+    """
+    uploads = ([], [])
+    for field, found in zip(('pdf_file', 'docx_file'), uploads):
+        seen = set()
+        for file in request.files.getlist(field):
+            if file.filename == '':
+                continue
+            with metrics.stage('upload'):
+                upload = Upload.from_stream(file.stream, app.config['UPLOAD_SPOOL_BYTES'], file.filename)
+            metrics.count('upload_bytes', upload.size)
+            if not upload or upload.digest in seen:
+                upload.close()
+                continue
+            seen.add(upload.digest)
+            found.append(upload)
+    return uploads
+
 @app.route('/parse', methods=['POST'])
 def parse_files():
     # Check for files
@@ -22,53 +186,362 @@ def parse_files():
     if not pdf_file and not docx_file:
         return jsonify({'error': 'No files uploaded'}), 400
 
-    data = {}
-    
-    # Paths
-    pdf_path = None
-    docx_path = None
-
     try:
-        # Process PDF (Doctors)
-        if pdf_file and pdf_file.filename != '':
-            pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_file.filename)
-            pdf_file.save(pdf_path)
-            from utils.parser import parse_doctors_pdf
-            data['doctors'] = parse_doctors_pdf(pdf_path)
-
-        # Process Docx (Exams)
-        if docx_file and docx_file.filename != '':
-            docx_path = os.path.join(app.config['UPLOAD_FOLDER'], docx_file.filename)
-            docx_file.save(docx_path)
-            from utils.parser import parse_exams_docx
-            data['exams'] = parse_exams_docx(docx_path)
-
-        # If both exist, perform matching
-        if 'doctors' in data and 'exams' in data:
-            from utils.parser import check_availability
-            data['matches'] = check_availability(data['exams'], data['doctors'])
-            
-            # DEBUG: Print first match to console
-            if data['matches']:
-                first = data['matches'][0]
-                print(f"\n{'='*60}")
-                print(f"DEBUG: Returning to browser")
-                print(f"Course: {first.get('course_name')}")
-                print(f"Date: {first.get('date')} ({first.get('day_of_week')})")
-                print(f"Available: {len(first.get('available_doctors', []))}")
-                ahmed_in = any("احمد" in d and "عماد" in d for d in first.get('available_doctors', []))
-                print(f"Ahmed in list: {ahmed_in}")
-                print(f"{'='*60}\n")
-            
-        # Clean up
-        if pdf_path and os.path.exists(pdf_path): os.remove(pdf_path)
-        if docx_path and os.path.exists(docx_path): os.remove(docx_path)
+        # Any number of pdf_file / docx_file fields, see process_uploads
+        data = process_uploads(*_read_uploads())
+
+        # DEBUG: Print first match to console (SCHEDULE_DEBUG=1)
+        if DEBUG_MATCHING and data.get('matches'):
+            first = data['matches'][0]
+            print(f"\n{'='*60}")
+            print(f"DEBUG: Returning to browser")
+            print(f"Course: {first.get('course_name')}")
+            print(f"Date: {first.get('date')} ({first.get('day_of_week')})")
+            print(f"Available: {len(first.get('available_doctors', []))}")
+            ahmed_in = any("احمد" in d and "عماد" in d for d in first.get('available_doctors', []))
+            print(f"Ahmed in list: {ahmed_in}")
+            print(f"{'='*60}\n")
         
         return jsonify({'success': True, 'data': data})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/parse/stream', methods=['POST'])
+def parse_stream():
+    """
+    Like /parse, but streams NDJSON: a "meta" line, one "match" line per exam as soon
+    as it is matched, a "conflicts" line (indexes in match order, worked out after the
+    last match), then "done". Needs the exams file(s), and the PDF(s) unless a
+    schedule is stored.
+    """
+    pdf_uploads, docx_uploads = _read_uploads()
+    # A row count, not a load, so nothing holds up the first line
+    if not docx_uploads or not (pdf_uploads or doctors_store.info()['doctors']):
+        for upload in [*pdf_uploads, *docx_uploads]:
+            upload.close()
+        return jsonify({'error': 'The exams file and a doctors PDF (uploaded now or before) are required'}), 400
+
+    def generate():
+        try:
+            try:
+                # Matching only needs an index, the schedule itself isn't sent
+                if pdf_uploads:
+                    snapshot, files = _load_doctors(pdf_uploads)
+                    index = doctors_store.busy_index(snapshot)
+                else:
+                    files = []
+                    index = doctors_store.busy_index()
+                exams = [(_load_exams(upload), upload) for upload in docx_uploads]
+            finally:
+                for upload in [*pdf_uploads, *docx_uploads]:
+                    upload.close()
+            files += [{'kind': 'docx', 'filename': upload.filename, 'digest': upload.digest, 'exams': len(file_exams)}
+                      for file_exams, upload in exams]
+            yield _ndjson({'type': 'meta', 'doctors': len(index.names), 'exams': sum(len(e) for e, _ in exams),
+                           'files': files})
+
+            all_exams = [exam for file_exams, upload in exams for exam in _exam_dicts(file_exams, upload)]
+            spans = [(exam.start, exam.end) for file_exams, _ in exams for exam in file_exams]
+
+            count = 0
+            for exam in iter_availability(all_exams, index, spans=spans):
+                count += 1
+                yield _ndjson({'type': 'match', 'exam': exam})
+
+            # Only once every match is out, so it doesn't hold up the first one
+            with metrics.stage('conflicts'):
+                conflicts = find_conflicts(all_exams)
+            yield _ndjson({'type': 'conflicts', 'conflicts': conflicts})
+            yield _ndjson({'type': 'done', 'count': count})
+        except Exception as e:
+            yield _ndjson({'type': 'error', 'error': str(e)})
+        finally:
+            g.stream_done = True
+
+    g.streaming = True
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _ndjson(obj):
+    return json.dumps(obj, ensure_ascii=False) + '\n'
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Same form as /parse, but returns a job id at once and does the work in the background.
+    """
+    pdf_uploads, docx_uploads = _read_uploads()
+    if not pdf_uploads and not docx_uploads:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    job_id = jobs.submit(process_uploads, pdf_uploads, docx_uploads)
+    return jsonify({'success': True, 'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    response = {'success': True, 'job_id': job_id, 'status': job['status'], 'progress': job.get('progress', {})}
+    if job['status'] == 'done':
+        response['data'] = job['result']
+    elif job['status'] == 'error':
+        response['error'] = job.get('error')
+    return jsonify(response)
+
+@app.route('/assign', methods=['POST'])
+def assign():
+    """
+    Assigns proctors to the matches of a /parse result. JSON body:
+    {"matches": [...], "proctors_per_exam": 1, "proctors_by_room": {"101": 2},
+     "max_load": null, "time_budget": 5}
+    """
+    body = request.get_json(silent=True) or {}
+    matches = body.get('matches')
+    if not isinstance(matches, list):
+        return jsonify({'error': 'matches (the /parse matches list) is required'}), 400
+
+    try:
+        result = _assign(matches, body)
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid assignment options'}), 400
+    return jsonify({'success': True, 'data': result})
+
+def _assign(matches, options):
+    # assign_proctors with the /assign options (a JSON body, or query args for exports)
+    from utils.assign import assign_proctors
+
+    per_exam = int(options.get('proctors_per_exam', 1))
+    by_room = {str(room): int(n) for room, n in (options.get('proctors_by_room') or {}).items()}
+    max_load = options.get('max_load')
+    max_load = int(max_load) if max_load not in (None, '') else None
+    time_budget = min(float(options.get('time_budget', 5)), app.config['ASSIGN_MAX_SECONDS'])
+
+    return assign_proctors(
+        matches,
+        proctors_per_exam=lambda exam: by_room.get(str(exam.get('room', '')), per_exam),
+        max_load=max_load,
+        time_budget=time_budget,
+    )
+
+@app.route('/export/<fmt>', methods=['POST'])
+def export_results(fmt):
+    """
+    Downloads results as csv, xlsx or ics. JSON body: {"matches": [...]} (the /parse
+    matches) or {"assignments": [...]} (the /assign assignments).
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown export format, use one of: {", ".join(EXPORT_FORMATS)}'}), 404
+
+    body = request.get_json(silent=True) or {}
+    assignments = isinstance(body.get('assignments'), list)
+    exams = body.get('assignments') if assignments else body.get('matches')
+    if not isinstance(exams, list):
+        return jsonify({'error': 'matches or assignments is required'}), 400
+    return _export_response(fmt, exams, assignments, 'assignments' if assignments else 'matches')
+
+@app.route('/jobs/<job_id>/export/<fmt>')
+def export_job(job_id, fmt):
+    """
+    Downloads the matches of a finished job as csv, xlsx or ics, read from the stored
+    result (nothing is parsed again). ?assign=1 exports a proctor assignment of them
+    instead, taking the /assign options as query args.
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown export format, use one of: {", ".join(EXPORT_FORMATS)}'}), 404
+
+    matches = jobs.iter_items(job_id, 'matches')
+    if matches is None:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        return jsonify({'error': 'The job has no matches to export yet', 'status': job['status']}), 409
+
+    if request.args.get('assign') not in (None, '', '0'):
+        try:
+            # The assignment looks at all exams at once, only its output is streamed
+            result = _assign(list(matches), request.args)
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': 'Invalid assignment options'}), 400
+        return _export_response(fmt, result['assignments'], True, f'assignments-{job_id[:8]}')
+    return _export_response(fmt, matches, False, f'matches-{job_id[:8]}')
+
+def _export_response(fmt, exams, assignments, name):
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(iter_export(fmt, exams, assignments), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{name}.{extension}"'})
+
+@app.route('/conflicts', methods=['POST'])
+def conflicts():
+    """
+    Room double-bookings and overlapping sittings of the same course section.
+    Either a JSON body {"exams": [...], "kinds": ["room", "section"]} (exam dicts as
+    /parse returns them, conflicts give indexes into that list), or the exam
+    timetable(s) as docx_file uploads (the parsed exams are returned too).
+    """
+    if request.files:
+        pdf_uploads, docx_uploads = _read_uploads()
+        for upload in pdf_uploads:
+            upload.close()
+        if not docx_uploads:
+            return jsonify({'error': 'No exams file uploaded'}), 400
+        try:
+            exams = [exam for upload in docx_uploads for exam in _exam_dicts(_load_exams(upload), upload)]
+        finally:
+            for upload in docx_uploads:
+                upload.close()
+        kinds = request.form.getlist('kinds') or CONFLICT_KINDS
+    else:
+        body = request.get_json(silent=True) or {}
+        exams = body.get('exams')
+        if not isinstance(exams, list) or not all(isinstance(exam, dict) for exam in exams):
+            return jsonify({'error': 'exams (a list of exam objects) or a docx_file upload is required'}), 400
+        kinds = body.get('kinds') or CONFLICT_KINDS
+
+    if not isinstance(kinds, (list, tuple)) or not set(kinds) <= set(CONFLICT_KINDS):
+        return jsonify({'error': f'kinds must be a list of: {", ".join(CONFLICT_KINDS)}'}), 400
+
+    with metrics.stage('conflicts'):
+        found = find_conflicts(exams, kinds)
+    data = {'conflicts': found, 'count': len(found)}
+    if request.files:
+        data['exams'] = exams
+    return jsonify({'success': True, 'data': data})
+
+@app.route('/doctors')
+def list_doctors():
+    """
+    Stored doctors schedule: ?q= filters names by substring, ?limit= / ?offset= page them.
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
+
+    info = doctors_store.info()
+    return jsonify({
+        'success': True,
+        'version': info['version'],
+        'updated': info['updated'],
+        'count': info['doctors'],
+        'doctors': doctors_store.names(query, limit, offset),
+    })
+
+@app.route('/doctors/<path:name>')
+def get_doctor(name):
+    doctor = doctors_store.doctor(name)
+    if doctor is None:
+        return jsonify({'error': 'Unknown doctor'}), 404
+    return jsonify({'success': True, 'name': name, **doctor})
+
+HHMM_RE = re.compile(r'^\d{1,2}:\d{2}$')
+
+@app.route('/free-time')
+def free_time():
+    """
+    Free gaps of the stored doctors schedule. ?doctor= and/or ?day= (Sun..Thu) slice it,
+    ?start= / ?end= (HH:MM) set the working window and ?min_gap= the shortest gap in minutes.
+    """
+    doctor = request.args.get('doctor')
+    day = request.args.get('day')
+    if day and day not in WEEKDAY_KEYS:
+        return jsonify({'error': f"day must be one of {', '.join(WEEKDAY_KEYS)}"}), 400
+
+    start = request.args.get('start', '08:00')
+    end = request.args.get('end', '16:00')
+    min_gap = request.args.get('min_gap', '15')
+    if not (HHMM_RE.match(start) and HHMM_RE.match(end) and min_gap.isdigit()):
+        return jsonify({'error': 'start / end must be HH:MM and min_gap a number of minutes'}), 400
+    day_start, day_end, min_gap = time_to_min(start), time_to_min(end), int(min_gap)
+
+    table = doctors_store.free_time(day_start, day_end, min_gap)
+    if doctor is not None:
+        slots = table.doctor(doctor, day)
+        if slots is None:
+            return jsonify({'error': 'Unknown doctor'}), 404
+        result = {doctor: slots}
+    elif day:
+        result = {name: {day: gaps} for name, gaps in table.day(day).items()}
+    else:
+        result = table.free
+
+    return jsonify({
+        'success': True,
+        'version': doctors_store.info()['version'],
+        'window': {'start': min_to_time(day_start), 'end': min_to_time(day_end), 'min_gap': min_gap},
+        'free_time': result,
+    })
+
+# Most windows one /free-doctors request may ask about
+MAX_QUERY_WINDOWS = 5000
+
+@app.route('/free-doctors', methods=['GET', 'POST'])
+def free_doctors():
+    """
+    Which stored doctors are free for a whole time window.
+    GET ?day=Tue&start=11:00&end=12:30 asks about one window; POST {"windows": [{"day",
+    "start", "end"}, ...]} asks about many at once (e.g. a whole grid). Adding "doctor"
+    (query arg or JSON key) answers just whether that doctor is free.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        windows = body.get('windows')
+        doctor = body.get('doctor')
+        if not isinstance(windows, list) or len(windows) > MAX_QUERY_WINDOWS:
+            return jsonify({'error': f'windows must be a list of at most {MAX_QUERY_WINDOWS} {{day, start, end}} objects'}), 400
+    else:
+        windows = [request.args]
+        doctor = request.args.get('doctor')
+
+    try:
+        parsed = [_query_window(window) for window in windows]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    index = doctors_store.busy_index()
+    if doctor is not None and doctor not in index.names:
+        return jsonify({'error': 'Unknown doctor'}), 404
+
+    results = []
+    for window, (day, start_min, end_min) in zip(windows, parsed):
+        result = {'day': day, 'start': window['start'], 'end': window['end']}
+        if doctor is not None:
+            result['free'] = index.is_free(doctor, day, start_min, end_min)
+        else:
+            result['doctors'] = index.free_doctors(day, start_min, end_min)
+        results.append(result)
+
+    response = {'success': True, 'version': doctors_store.info()['version']}
+    if request.method == 'POST':
+        response['results'] = results
+    else:
+        response.update(results[0])
+    return jsonify(response)
+
+def _query_window(window):
+    # (day, start, end minutes) of a {day, start, end} window, ValueError if malformed
+    if not hasattr(window, 'get'):
+        raise ValueError('Each window must be a {day, start, end} object')
+    day, start, end = window.get('day'), window.get('start'), window.get('end')
+    if day not in WEEKDAY_KEYS:
+        raise ValueError(f"day must be one of {', '.join(WEEKDAY_KEYS)}")
+    if not (isinstance(start, str) and isinstance(end, str) and HHMM_RE.match(start) and HHMM_RE.match(end)):
+        raise ValueError('start / end must be HH:MM')
+    return day, time_to_min(start), time_to_min(end)
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(parse_cache.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus text format: stage timings, event counts and request durations of this
+    worker process, plus the parse cache counters.
+    """
+    gauges = {f'parse_cache_{key}': value for key, value in parse_cache.stats().items()}
+    return Response(metrics.REGISTRY.render(gauges), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,268 @@
+"""
+Offline batch processing: parses many doctors PDFs / exams DOCX files at once and
+matches each department's exams against its own doctors schedule.
+
+    python batch.py schedules/ "archive/2024-*/*.docx" --output results --format json,csv
+
+Inputs are files, directories (their .pdf / .docx files, --recursive for subfolders)
+or glob patterns. Files are paired by department: the file name with words like
+"doctors", "exams" or "schedule" taken out, so "CS_doctors.pdf" goes with
+"cs-exams.docx" (a name left empty falls back to the folder name). --pair-regex
+takes the department from the first group of a regex matched against the file name
+instead. A file with no partner is still parsed, there's just nothing to match.
+
+Pairs are spread over a process pool. Each one writes <output>/<department>.json
+(same shape as the /parse data, plus "errors") and, if there are matches,
+<department>.csv. One JSON line per pair is printed as soon as it's done, a broken
+file only fails its own pair, and a summary line with the throughput comes last.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+KINDS = {".pdf": "pdf", ".docx": "docx"}
+
+# Name words that say what the file is rather than whose it is
+KIND_WORDS = {
+    "doctor", "doctors", "lecturer", "lecturers", "faculty", "staff", "teaching",
+    "exam", "exams", "final", "finals", "schedule", "schedules", "timetable", "timetables",
+    "جدول", "جداول", "الامتحانات", "امتحانات", "الدكاترة", "المدرسين", "المحاضرين",
+}
+
+
+def find_inputs(patterns, recursive=False):
+    """
+    The .pdf / .docx files named by the given paths, directories and glob patterns,
+    deduplicated, in the order given.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            walk = os.path.join(pattern, "**", "*") if recursive else os.path.join(pattern, "*")
+            matched = sorted(glob.glob(walk, recursive=recursive))
+        elif os.path.isfile(pattern):
+            matched = [pattern]
+        else:
+            matched = sorted(glob.glob(pattern, recursive=True))
+        for path in matched:
+            name = os.path.basename(path)
+            # Skip Word's "~$name.docx" lock files
+            if os.path.isfile(path) and _kind(path) and not name.startswith("~$"):
+                paths.append(os.path.normpath(path))
+    return list(dict.fromkeys(paths))
+
+
+def department_key(path, pair_regex=None):
+    """
+    Department a file belongs to, see the module docstring.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if pair_regex is not None:
+        m = pair_regex.search(stem)
+        if m:
+            return (m.group(1) if m.groups() else m.group(0)).strip().lower()
+
+    words = [w for w in re.split(r"[\W_]+", stem.lower()) if w and w not in KIND_WORDS]
+    if words:
+        return "-".join(words)
+    return os.path.basename(os.path.dirname(os.path.abspath(path))).lower() or stem.lower()
+
+
+def pair_files(paths, pair_regex=None):
+    """
+    {department: {"pdf": [paths], "docx": [paths]}} in first-seen order.
+    """
+    pairs = {}
+    for path in paths:
+        files = pairs.setdefault(department_key(path, pair_regex), {"pdf": [], "docx": []})
+        files[_kind(path)].append(path)
+    return pairs
+
+
+def _kind(path):
+    return KINDS.get(os.path.splitext(path)[1].lower())
+
+
+def process_pair(department, pdf_path, docx_path, output_dir, formats, engine="index"):
+    """
+    Parses and matches one department (runs in a pool worker) and writes its outputs.
+    Returns a summary record; failures are reported in it rather than raised.
+    """
+    from utils import metrics
+    from utils.parser import parse_doctors_pdf, parse_exams_docx, check_availability
+
+    started = time.perf_counter()
+    trace = metrics.start_trace(department)
+    data = {"department": department, "sources": {"pdf": pdf_path, "docx": docx_path}}
+    errors = {}
+
+    # The parsers print their warnings, keep stdout for the result lines
+    with contextlib.redirect_stdout(sys.stderr):
+        doctors = None
+        if pdf_path:
+            try:
+                doctors = parse_doctors_pdf(pdf_path)
+                data["doctors"] = doctors
+                if not doctors:
+                    errors["pdf"] = "no doctors found"
+            except Exception as e:
+                errors["pdf"] = f"{type(e).__name__}: {e}"
+
+        if docx_path:
+            try:
+                data["exams"] = parse_exams_docx(docx_path)
+                # An unreadable file only gets a warning printed, so check the result
+                if not data["exams"]:
+                    errors["docx"] = "no exams found (not a readable exams .docx?)"
+            except Exception as e:
+                errors["docx"] = f"{type(e).__name__}: {e}"
+
+        if doctors is not None and "exams" in data:
+            try:
+                data["matches"] = check_availability([dict(exam) for exam in data["exams"]], doctors, engine=engine)
+            except Exception as e:
+                errors["match"] = f"{type(e).__name__}: {e}"
+
+    data["errors"] = errors
+    outputs = []
+    try:
+        outputs = _write_outputs(data, output_dir, formats)
+    except OSError as e:
+        errors["output"] = str(e)
+    metrics.end_trace()
+
+    return {
+        "type": "result",
+        "department": department,
+        "status": "error" if errors else "ok",
+        "pdf": pdf_path,
+        "docx": docx_path,
+        "doctors": len(data.get("doctors", ())),
+        "exams": len(data.get("exams", ())),
+        "matches": len(data.get("matches", ())),
+        "pages": trace.counts.get("pages", 0),
+        "seconds": round(time.perf_counter() - started, 3),
+        "outputs": outputs,
+        "errors": errors,
+    }
+
+
+def _write_outputs(data, output_dir, formats):
+    from utils.export import write_matches_csv
+
+    base = os.path.join(output_dir, _safe_name(data["department"]))
+    outputs = []
+    if "json" in formats:
+        _write_atomic(base + ".json", lambda f: json.dump(data, f, ensure_ascii=False))
+        outputs.append(base + ".json")
+    if "csv" in formats and "matches" in data:
+        # utf-8-sig so Excel shows the Arabic names
+        _write_atomic(base + ".csv", lambda f: write_matches_csv(f, data["matches"]), encoding="utf-8-sig")
+        outputs.append(base + ".csv")
+    return outputs
+
+
+def _write_atomic(path, write, encoding="utf-8"):
+    # A half-written file never replaces a good one from an earlier run
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding=encoding, newline="") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]+", "_", name).strip("._") or "department"
+
+
+def _size(*paths):
+    return sum(os.path.getsize(p) for p in paths if p)
+
+
+def _emit(record):
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    ap.add_argument("--output", "-o", default="batch_output", help="directory for the per-department results")
+    ap.add_argument("--format", default="json,csv", help="comma-separated: json, csv")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default: all cores)")
+    ap.add_argument("--engine", default="index", choices=["index", "numpy", "python"],
+                    help="check_availability engine")
+    ap.add_argument("--pair-regex", type=re.compile, help="regex whose first group is the department")
+    ap.add_argument("--recursive", "-r", action="store_true", help="also look in subdirectories")
+    args = ap.parse_args(argv)
+
+    formats = {f.strip() for f in args.format.split(",") if f.strip()}
+    if not formats <= {"json", "csv"}:
+        ap.error("--format takes json and/or csv")
+
+    paths = find_inputs(args.inputs, args.recursive)
+    if not paths:
+        ap.error("no .pdf / .docx files found")
+    os.makedirs(args.output, exist_ok=True)
+
+    started = time.perf_counter()
+    done = failed = ambiguous = pages = exams = 0
+    jobs = []
+    for department, files in pair_files(paths, args.pair_regex).items():
+        if len(files["pdf"]) > 1 or len(files["docx"]) > 1:
+            ambiguous += 1
+            _emit({"type": "result", "department": department, "status": "error",
+                   "errors": {"pairing": f"several files for one department: {files['pdf'] + files['docx']}"}})
+            continue
+        jobs.append((department, (files["pdf"] or [None])[0], (files["docx"] or [None])[0]))
+
+    # Biggest first, so a large PDF doesn't start last and hold up the end of the run
+    jobs.sort(key=lambda job: _size(job[1], job[2]), reverse=True)
+    input_bytes = sum(_size(pdf, docx) for _, pdf, docx in jobs)
+
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs) or 1))) as pool:
+        futures = {pool.submit(process_pair, department, pdf, docx, args.output, formats, args.engine):
+                   (department, pdf, docx) for department, pdf, docx in jobs}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory); the pool carries on with the rest
+                department, pdf, docx = futures[future]
+                record = {"type": "result", "department": department, "status": "error", "pdf": pdf,
+                          "docx": docx, "errors": {"worker": f"{type(e).__name__}: {e}"}}
+            done += 1
+            failed += record["status"] == "error"
+            pages += record.get("pages", 0)
+            exams += record.get("exams", 0)
+            _emit(record)
+
+    seconds = time.perf_counter() - started
+    _emit({
+        "type": "summary",
+        "departments": done + ambiguous,
+        "failed": failed + ambiguous,
+        "files": len(paths),
+        "pages": pages,
+        "exams": exams,
+        "megabytes": round(input_bytes / 1e6, 3),
+        "seconds": round(seconds, 3),
+        "departments_per_s": round(done / seconds, 3) if seconds else None,
+        "pages_per_s": round(pages / seconds, 1) if seconds else None,
+        "exams_per_s": round(exams / seconds, 1) if seconds else None,
+        "workers": args.workers,
+    })
+    return 1 if failed or ambiguous else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Proctor assignment solver scaling (utils/assign.py) on synthetic availability.
+
+    python -m bench.bench_assign --exams 500,2000,5000 --doctors 60,150 --proctors 1,2
+
+For every combination, times check_availability's output through assign_proctors
+and records the solver stats (seats filled, whether the max-flow finished within
+--time-budget), one JSON object per line.
+"""
+import argparse
+
+from bench.harness import quiet, measure, summarize, grid, int_list, open_output, emit
+from utils.assign import assign_proctors
+from utils.parser import check_availability
+from utils.synthetic import doctors_dict, exam_dicts
+
+
+def run(params, repeat, time_budget):
+    doctors = doctors_dict(params["doctors"], slots=params["slots"], seed=params["seed"])
+    with quiet():
+        matches = check_availability(exam_dicts(params["exams"], seed=params["seed"], days=params["days"]), doctors)
+    max_load = params["max_load"] or None
+
+    results = []
+    for mode, budget in (("greedy", 0), ("flow", time_budget)):
+        stats = {}
+
+        def solve():
+            stats.update(assign_proctors(matches, params["proctors"], max_load, time_budget=budget)["stats"])
+
+        timings = measure(solve, repeat)
+        stats.pop("seconds", None)
+        results.append(summarize("assign_proctors", params, timings, items=params["exams"], mode=mode, **stats))
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--exams", type=int_list, default=[500, 2000])
+    ap.add_argument("--doctors", type=int_list, default=[60, 150])
+    ap.add_argument("--slots", type=int_list, default=[12])
+    ap.add_argument("--days", type=int_list, default=[21], help="Length of the exam season in days")
+    ap.add_argument("--proctors", type=int_list, default=[1, 2], help="Proctors per exam")
+    ap.add_argument("--max-load", type=int_list, default=[0], help="Max exams per doctor (0 = no limit)")
+    ap.add_argument("--time-budget", type=float, default=5.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    out = open_output(args.output)
+    axes = grid(exams=args.exams, doctors=args.doctors, slots=args.slots, days=args.days,
+                proctors=args.proctors, max_load=args.max_load, seed=[args.seed])
+    for params in axes:
+        for record in run(params, args.repeat, args.time_budget):
+            emit(out, record)
+
+
+if __name__ == "__main__":
+    main()
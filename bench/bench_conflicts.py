@@ -0,0 +1,75 @@
+"""
+Exam clash detection scaling (utils/conflicts.py) on synthetic timetables.
+
+    python -m bench.bench_conflicts --exams 1000,5000,20000 --rooms 30,200
+
+For every combination, times find_conflicts and, up to --pairwise-max exams, the
+naive every-pair comparison it replaces (checking both find the same clashes), one
+JSON object per line. The sweep should grow roughly linearly with the exams; the
+pairwise scan grows with their square.
+"""
+import argparse
+import itertools
+
+from bench.harness import measure, summarize, grid, int_list, open_output, emit
+from utils.conflicts import find_conflicts
+from utils.parser import time_to_min
+from utils.synthetic import exam_dicts
+
+
+def pairwise_conflicts(exams):
+    # The O(n^2) reference: same clash rules as find_conflicts, every pair compared
+    found = set()
+    spans = [(time_to_min(e["start"]), time_to_min(e["end"])) for e in exams]
+    for i, j in itertools.combinations(range(len(exams)), 2):
+        a, b = exams[i], exams[j]
+        if a["date"] != b["date"] or max(spans[i][0], spans[j][0]) >= min(spans[i][1], spans[j][1]):
+            continue
+        if a["room"] == b["room"] and a["course_name"] != b["course_name"]:
+            found.add(("room", i, j))
+        if a["course_name"] == b["course_name"] and a["section"] == b["section"]:
+            found.add(("section", i, j))
+    return found
+
+
+def run(params, repeat, pairwise_max):
+    exams = exam_dicts(params["exams"], seed=params["seed"], days=params["days"], rooms=params["rooms"])
+    result = {}
+
+    def sweep():
+        result["conflicts"] = find_conflicts(exams)
+
+    records = [summarize("find_conflicts", params, measure(sweep, repeat), items=params["exams"],
+                         mode="sweep", conflicts=len(result["conflicts"]))]
+
+    if params["exams"] <= pairwise_max:
+        def pairwise():
+            result["pairwise"] = pairwise_conflicts(exams)
+
+        timings = measure(pairwise, 1)
+        same = result["pairwise"] == {(c["kind"], *c["exams"]) for c in result["conflicts"]}
+        records.append(summarize("find_conflicts", params, timings, items=params["exams"], mode="pairwise",
+                                 conflicts=len(result["pairwise"]), same_result=same,
+                                 speedup=min(timings) / records[0]["min_s"]))
+    return records
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--exams", type=int_list, default=[1000, 5000, 20000])
+    ap.add_argument("--rooms", type=int_list, default=[30, 200])
+    ap.add_argument("--days", type=int_list, default=[21], help="Length of the exam season in days")
+    ap.add_argument("--pairwise-max", type=int, default=5000, help="Largest size also timed pairwise")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    out = open_output(args.output)
+    for params in grid(exams=args.exams, rooms=args.rooms, days=args.days, seed=[args.seed]):
+        for record in run(params, args.repeat, args.pairwise_max):
+            emit(out, record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per-worker cost of the doctors index: a BusyIndex built from the stored schedule
+(what every worker used to do) vs mapping the shared index file (utils/mapped_index.py).
+
+    python -m bench.bench_index --doctors 200,1000 --slots 12 --exams 2000
+
+For each size, one JSON line per mode with the time to get a usable index in a
+worker, the Python heap it holds (tracemalloc; the mapped file itself is shared
+page cache, reported as file_bytes) and check_availability over --exams exams.
+"""
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from contextlib import closing
+
+from bench.harness import measure, summarize, grid, int_list, open_output, emit
+from utils.availability import BusyIndex
+from utils.mapped_index import MappedIndex, publish
+from utils.model import DoctorsDB
+from utils.parser import check_availability
+from utils.store import DoctorsStore
+from utils.synthetic import doctors_dict, exam_dicts
+
+
+def held_bytes(build):
+    # Python heap still held by what build() returns
+    tracemalloc.start()
+    obj = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return held
+
+
+def run(params, repeat, directory):
+    docs = doctors_dict(params["doctors"], slots=params["slots"], seed=params["seed"])
+    store = DoctorsStore(os.path.join(directory, "doctors.sqlite3"), "bench")
+    exams = exam_dicts(params["exams"], seed=params["seed"])
+
+    # The store as a worker sees it: the rows in SQLite (written directly, updating
+    # the store needs a PDF) and the published index file
+    with closing(store._connect()) as conn, conn:
+        conn.executemany("INSERT INTO doctors (name, busy_slots, position, updated) VALUES (?, ?, ?, 0)",
+                         [(name, json.dumps(doc["busy_slots"]), i) for i, (name, doc) in enumerate(docs.items())])
+    path = publish(os.path.join(directory, "index"), 1, DoctorsDB.from_dict(docs))
+
+    def load_and_build():
+        store._loaded = (None, None)
+        return BusyIndex(store.load())
+
+    modes = {"busy_index": load_and_build, "mapped": lambda: MappedIndex(path)}
+    records = []
+    for mode, build in modes.items():
+        timings = measure(build, repeat)
+        index = build()
+        match = measure(lambda: check_availability([dict(e) for e in exams], index), repeat)
+        records.append(summarize("doctors_index", params, timings, mode=mode,
+                                 held_bytes=held_bytes(build), file_bytes=os.path.getsize(path),
+                                 match_min_s=min(match)))
+    return records
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--doctors", type=int_list, default=[200, 1000])
+    ap.add_argument("--slots", type=int_list, default=[12])
+    ap.add_argument("--exams", type=int_list, default=[2000])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    out = open_output(args.output)
+    for params in grid(doctors=args.doctors, slots=args.slots, exams=args.exams, seed=[args.seed]):
+        with tempfile.TemporaryDirectory() as directory:
+            for record in run(params, args.repeat, directory):
+                emit(out, record)
+
+
+if __name__ == "__main__":
+    main()
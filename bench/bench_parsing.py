@@ -0,0 +1,135 @@
+"""
+Parser and matcher benchmarks on synthetic schedules (see utils/synthetic.py).
+
+    python -m bench.bench_parsing --pages 50,200 --doctors 40 --slots 8 --exams 500,2000
+
+Times parse_doctors_pdf, parse_exams_docx, parse_time_slot, check_availability (per
+engine) and calculate_free_time separately for every parameter combination, and
+writes one JSON object per line (stdout, or --output). parse_time_slot and
+check_availability are timed "cold" (their memo caches cleared before every run)
+and "warm" (caches left filled), reported as separate records.
+
+parse_doctors_pdf is also timed across a --workers process pool, on a PDF whose
+lecturers come in spelling-variant pairs, with same_result telling whether the pool
+gave exactly the serial result (each pair folds into one lecturer in both).
+
+DoctorsStore.update_from_pdf is timed into a fresh store on a PDF whose pages all
+share one content stream and draw their lecturer through a form XObject, with
+same_result telling whether the store holds exactly what parse_doctors_pdf returns
+(pages that differ only in their resources must not share a cached page result).
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+
+from bench.harness import measure, summarize, grid, int_list, open_output, emit
+from utils.parser import parse_doctors_pdf, parse_exams_docx, parse_time_slot, check_availability, calculate_free_time
+from utils.parser import _date_weekday, _scan_time_slot
+from utils.model import DoctorsDB
+from utils.store import DoctorsStore
+from utils.synthetic import doctors_pdf, exams_docx, time_cell, exam_time
+
+ENGINES = ["index", "numpy", "python"]
+
+
+def run(params, repeat, engines, workers=2):
+    pdf_bytes = doctors_pdf(params["pages"], params["doctors"], params["slots"], seed=params["seed"])
+    docx_bytes = exams_docx(params["exams"], seed=params["seed"])
+
+    results = []
+
+    timings = measure(lambda: parse_doctors_pdf(pdf_bytes), repeat)
+    results.append(summarize("parse_doctors_pdf", params, timings, items=params["pages"], bytes=len(pdf_bytes)))
+
+    if workers > 1:
+        variants_pdf = doctors_pdf(params["pages"], params["doctors"], params["slots"], seed=params["seed"],
+                                   spelling_variants=True)
+        serial = parse_doctors_pdf(variants_pdf)
+        result = {}
+
+        def parallel():
+            result["doctors"] = parse_doctors_pdf(variants_pdf, workers=workers, min_pages=1)
+
+        timings = measure(parallel, repeat)
+        results.append(summarize("parse_doctors_pdf", params, timings, items=params["pages"], mode="parallel",
+                                 workers=workers, same_result=list(result["doctors"].items()) == list(serial.items())))
+
+    xobjects_pdf = doctors_pdf(params["pages"], params["doctors"], params["slots"], seed=params["seed"],
+                               xobjects=True)
+    expected = DoctorsDB.from_dict(parse_doctors_pdf(xobjects_pdf)).to_dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = []
+
+        def fresh_store():
+            stores.append(DoctorsStore(os.path.join(tmp, f"doctors-{len(stores)}.db"), "bench"))
+            return stores[-1]
+
+        timings = measure(lambda store: store.update_from_pdf(xobjects_pdf), repeat, setup=fresh_store)
+        results.append(summarize("store_update_from_pdf", params, timings, items=params["pages"], mode="xobjects",
+                                 same_result=all(store.load().to_dict() == expected for store in stores)))
+
+    timings = measure(lambda: parse_exams_docx(docx_bytes), repeat)
+    results.append(summarize("parse_exams_docx", params, timings, items=params["exams"], bytes=len(docx_bytes)))
+
+    # One cell per timetable row of the PDF plus one per exam row, as the parsers see them
+    rnd = random.Random(params["seed"])
+    cells = [(time_cell(rnd), False) for _ in range(params["pages"] * params["slots"])]
+    cells += [(exam_time(rnd), True) for _ in range(params["exams"])]
+    # The tokenizer is memoized and the parsers above have just filled its cache: "cold"
+    # clears it before every run (the tokenizer itself), "warm" leaves it (cache hits)
+    def parse_cells(_):
+        return [parse_time_slot(cell, is_exam=is_exam) for cell, is_exam in cells]
+
+    for mode, setup in (("cold", _scan_time_slot.cache_clear), ("warm", lambda: None)):
+        timings = measure(parse_cells, repeat, setup=setup)
+        results.append(summarize("parse_time_slot", params, timings, items=len(cells), mode=mode))
+
+    doctors = parse_doctors_pdf(pdf_bytes)
+    exams = parse_exams_docx(docx_bytes)
+    for engine in engines:
+        # Same for the date -> weekday memo the matcher uses
+        def cold():
+            _date_weekday.cache_clear()
+            return copy.deepcopy(exams)
+
+        for mode, setup in (("cold", cold), ("warm", lambda: copy.deepcopy(exams))):
+            timings = measure(lambda exams: check_availability(exams, doctors, engine=engine), repeat, setup=setup)
+            results.append(summarize("check_availability", params, timings, items=len(exams), engine=engine,
+                                     mode=mode))
+
+    # calculate_free_time takes one lecturer's course list
+    courses_by_doctor = [
+        [{"days": [day], "start": start, "end": end}
+         for day, slots in doc_data["busy_slots"].items() for start, end in slots]
+        for doc_data in doctors.values()
+    ]
+    timings = measure(lambda: [calculate_free_time(courses) for courses in courses_by_doctor], repeat)
+    results.append(summarize("calculate_free_time", params, timings, items=len(courses_by_doctor)))
+
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int_list, default=[20, 100])
+    ap.add_argument("--doctors", type=int_list, default=[20])
+    ap.add_argument("--slots", type=int_list, default=[6])
+    ap.add_argument("--exams", type=int_list, default=[200, 1000])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--engines", default=",".join(ENGINES), help="check_availability engines to time")
+    ap.add_argument("--workers", type=int, default=2, help="process pool size for the parallel PDF parse (1 = skip)")
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    out = open_output(args.output)
+    engines = [e for e in args.engines.split(",") if e]
+    for params in grid(pages=args.pages, doctors=args.doctors, slots=args.slots, exams=args.exams, seed=[args.seed]):
+        for record in run(params, args.repeat, engines, args.workers):
+            emit(out, record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup benchmark: import time of the app and first-request vs steady-state latency,
+with and without the warm-up (utils/warmup.py), each run in a fresh interpreter.
+
+    python -m bench.bench_startup --pages 20 --exams 200 --repeat 5
+
+A run imports app (timed), optionally warms up, then POSTs a synthetic schedule to
+/parse --requests times, each with a different seed so every request really parses.
+The stores and caches go to a temp directory. Writes one JSON object per line
+(stdout, or --output).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench.harness import summarize, open_output, emit
+
+MODES = ["cold", "warm"]
+
+
+def child(mode, pages, exams, requests):
+    # Runs inside the fresh interpreter; prints one JSON line with the timings
+    import io
+    import time
+
+    t0 = time.perf_counter()
+    import app as app_module
+    import_s = time.perf_counter() - t0
+
+    warm_up_s = 0.0
+    if mode == "warm":
+        from utils.warmup import warm_up
+        t0 = time.perf_counter()
+        warm_up(app_module.app)
+        warm_up_s = time.perf_counter() - t0
+
+    from utils.synthetic import doctors_pdf, exams_docx
+
+    client = app_module.app.test_client()
+    latencies = []
+    for seed in range(requests):
+        # Build the files outside the timed part
+        data = {
+            'pdf_file': (io.BytesIO(doctors_pdf(pages, doctors=max(pages // 2, 1), seed=seed)), 'doctors.pdf'),
+            'docx_file': (io.BytesIO(exams_docx(exams, seed=seed)), 'exams.docx'),
+        }
+        t0 = time.perf_counter()
+        response = client.post('/parse', data=data, content_type='multipart/form-data')
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            raise RuntimeError(f"/parse answered {response.status_code}")
+
+    print(json.dumps({"import_s": import_s, "warm_up_s": warm_up_s, "latencies": latencies}))
+
+
+def run_child(mode, pages, exams, requests):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DOCTORS_DB=os.path.join(tmp, 'doctors.sqlite3'),
+                   PARSE_CACHE_DIR=os.path.join(tmp, 'cache'), JOBS_DIR=os.path.join(tmp, 'jobs'))
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.bench_startup", "--child", mode,
+             "--pages", str(pages), "--exams", str(exams), "--requests", str(requests)],
+            cwd=root, env=env, capture_output=True, text=True, check=True,
+        )
+    # The app logs its requests on stderr; the result is the last stdout line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--exams", type=int, default=200)
+    ap.add_argument("--requests", type=int, default=4, help="/parse requests per run (first + steady)")
+    ap.add_argument("--repeat", type=int, default=3, help="fresh interpreters per mode")
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.pages, args.exams, args.requests)
+        return
+
+    out = open_output(args.output)
+    params = {"pages": args.pages, "exams": args.exams, "requests": args.requests}
+    for mode in [m for m in args.modes.split(",") if m]:
+        runs = [run_child(mode, args.pages, args.exams, args.requests) for _ in range(args.repeat)]
+        first = [run["latencies"][0] for run in runs]
+        steady = [statistics.median(run["latencies"][1:]) for run in runs if len(run["latencies"]) > 1]
+
+        emit(out, summarize("import_app", params, [run["import_s"] for run in runs], mode=mode))
+        if mode == "warm":
+            emit(out, summarize("warm_up", params, [run["warm_up_s"] for run in runs], mode=mode))
+        emit(out, summarize("first_request", params, first, mode=mode))
+        if steady:
+            emit(out, summarize("steady_request", params, steady, mode=mode,
+                                first_over_steady=statistics.median(first) / statistics.median(steady)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Shared helpers for the benchmark scripts in bench/: timing, parameter grids and
+JSON-lines output.
+"""
+import contextlib
+import gc
+import itertools
+import json
+import statistics
+import sys
+import time
+
+
+def quiet():
+    """
+    Sends whatever the code under test prints to stderr, stdout is kept for results.
+    """
+    return contextlib.redirect_stdout(sys.stderr)
+
+
+def measure(fn, repeat=3, setup=None):
+    """
+    Runs fn() `repeat` times and returns the wall-clock seconds of each run.
+    setup(), if given, runs before each call (untimed) and its result is passed to fn.
+    """
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        with quiet():
+            t0 = time.perf_counter()
+            fn(arg) if setup else fn()
+            timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def summarize(name, params, timings, items=None, **extra):
+    """
+    One result record: min / median / mean seconds, plus per-item cost when items is known.
+    """
+    record = {
+        "benchmark": name,
+        "params": params,
+        "repeat": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+    if items:
+        record["items"] = items
+        record["per_item_us"] = min(timings) / items * 1e6
+    record.update(extra)
+    return record
+
+
+def grid(**axes):
+    """
+    Every combination of the given parameter lists, as dicts.
+    """
+    keys = list(axes)
+    for values in itertools.product(*(axes[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def int_list(value):
+    # "50,200" -> [50, 200] for argparse
+    return [int(v) for v in value.split(',') if v]
+
+
+def open_output(path):
+    return sys.stdout if path in (None, '-') else open(path, 'w', encoding='utf-8')
+
+
+def emit(out, record):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
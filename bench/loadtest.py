@@ -0,0 +1,358 @@
+"""
+Load test: runs the app under gunicorn and drives it with concurrent uploads of
+synthetic schedules, to see how many /parse users one dyno can take.
+
+    python -m bench.loadtest --worker-class sync,gthread --workers 1,2,4 --concurrency 1,8,32
+
+For every combination a fresh gunicorn (gunicorn.conf.py, with the warm-up) is
+started on a free local port, with its doctors store, parse cache and job files in a
+temp directory. --concurrency client threads then POST for --duration seconds:
+
+  full    a doctors PDF and an exams DOCX to /parse, cycling through --variants
+          different pairs (the store and parse cache only skip work for pairs
+          already seen, so a high --variants keeps them cold)
+  exams   only an exams DOCX to /parse, matched against the stored schedule
+  stream  both files to /parse/stream, reading the NDJSON to the end
+
+Every 200 response is also checked against the upload it answers: its doctors (the
+/parse "doctors", the stream's meta count) and every available doctor must be the
+ones of that request's own PDF (or the stored one, for "exams"). A response that
+shows another request's schedule counts as a "wrong_doctors" error.
+
+Each run is one JSON line: p50 / p95 / p99 / max latency, requests per second,
+errors by status, and the RSS (now and peak, from /proc) of every gunicorn worker.
+Only the standard library is used on the client side.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from bench.harness import grid, int_list, open_output, emit
+from utils.parser import UNKNOWN_DAY, parse_doctors_pdf
+from utils.synthetic import doctors_pdf, exams_docx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {
+    "full": ("/parse", ("pdf_file", "docx_file")),
+    "exams": ("/parse", ("docx_file",)),
+    "stream": ("/parse/stream", ("pdf_file", "docx_file")),
+}
+
+
+def multipart(files):
+    """
+    (body, content type) of a multipart/form-data POST of {field: (filename, bytes)}.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_payloads(scenario, variants, pages, exams, stored=None):
+    """
+    (path, [(body, content type, doctor names the response must show)]). Request
+    bodies are built up front, the client threads only send them. stored is the
+    doctors PDF the "exams" scenario matches against.
+    """
+    path, fields = SCENARIOS[scenario]
+    payloads = []
+    for seed in range(variants):
+        files = {}
+        if "pdf_file" in fields:
+            files["pdf_file"] = ("doctors.pdf", doctors_pdf(pages, doctors=max(pages // 2, 1), seed=seed))
+        files["docx_file"] = ("exams.docx", exams_docx(exams, seed=seed))
+        expected = frozenset(parse_doctors_pdf(files["pdf_file"][1] if "pdf_file" in files else stored))
+        payloads.append((*multipart(files), expected))
+    return path, payloads
+
+
+def own_doctors(body, expected, stream=False):
+    """
+    True if a 200 /parse (JSON) or, with stream, /parse/stream (NDJSON) body shows
+    exactly the expected doctors, i.e. the schedule its own request uploaded.
+    """
+    try:
+        if not stream:
+            data = json.loads(body)["data"]
+            doctors = set(data["doctors"])
+            matches = data.get("matches", [])
+        else:
+            lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+            if any(line["type"] == "error" for line in lines):
+                return False
+            meta = next(line for line in lines if line["type"] == "meta")
+            doctors = expected if meta["doctors"] == len(expected) else None
+            matches = [line["exam"] for line in lines if line["type"] == "match"]
+    except (ValueError, KeyError, StopIteration):
+        return False
+    available = {name for exam in matches for name in exam["available_doctors"] if name != UNKNOWN_DAY}
+    return doctors == expected and available <= expected
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """
+    A gunicorn serving the app from the repo, in its own temp state directory.
+    """
+
+    def __init__(self, worker_class, workers, threads, timeout=120):
+        self.port = free_port()
+        self.tmp = tempfile.mkdtemp(prefix="loadtest-")
+        env = dict(os.environ,
+                   DOCTORS_DB=os.path.join(self.tmp, "doctors.sqlite3"),
+                   PARSE_CACHE_DIR=os.path.join(self.tmp, "cache"),
+                   JOBS_DIR=os.path.join(self.tmp, "jobs"))
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--worker-class", worker_class,
+               "--workers", str(workers), "--threads", str(threads), "--timeout", str(timeout),
+               "--bind", f"127.0.0.1:{self.port}", "app:app"]
+        self.log = open(os.path.join(self.tmp, "gunicorn.log"), "w")
+        # The app logs a JSON line per request on stderr, keep it out of the results
+        self.process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=self.log, stderr=self.log)
+        self.workers = workers
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {self.process.returncode}: {self.last_log_line()}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                conn.request("GET", "/")
+                ok = conn.getresponse().status == 200
+                conn.close()
+                if ok and len(self.worker_pids()) >= self.workers:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("gunicorn didn't come up in time")
+
+    def last_log_line(self):
+        # The temp directory goes away with stop(), so errors quote the log (its last error) instead
+        self.log.flush()
+        with open(self.log.name, encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        errors = [line for line in lines if "Error" in line or "error" in line]
+        return (errors or lines or [""])[-1]
+
+    def worker_pids(self):
+        return _children(self.process.pid)
+
+    def memory(self):
+        """
+        {pid: {"rss_mb", "peak_rss_mb"}} of the workers (Linux /proc), {} elsewhere.
+        """
+        out = {}
+        for pid in self.worker_pids():
+            status = _proc_status(pid)
+            if "VmRSS" in status:
+                out[pid] = {"rss_mb": round(status["VmRSS"] / 1024, 1),
+                            "peak_rss_mb": round(status.get("VmHWM", status["VmRSS"]) / 1024, 1)}
+        return out
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def _children(pid):
+    # Direct children of pid, from /proc (the gunicorn workers of a master)
+    children = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def _proc_status(pid):
+    # {"VmRSS": kB, "VmHWM": kB, ...} from /proc/<pid>/status
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    values[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def drive(port, path, payloads, concurrency, duration, timeout, requests=None):
+    """
+    concurrency threads, each sending requests back to back (on its own keep-alive
+    connection) until duration runs out, or each has sent `requests`.
+    Returns (latencies, status counts, seconds).
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(worker):
+        conn = None
+        n = worker
+        sent = 0
+        while (time.monotonic() < deadline) if requests is None else (sent < requests):
+            sent += 1
+            body, content_type, expected = payloads[n % len(payloads)]
+            n += concurrency
+            t0 = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+                conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                content = response.read()
+                status = response.status
+                if status == 200 and not own_doctors(content, expected, path == "/parse/stream"):
+                    status = "wrong_doctors"
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                if conn is not None:
+                    conn.close()
+                conn = None
+            elapsed = time.perf_counter() - t0
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        if conn is not None:
+            conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run(params, payloads, path, duration, warmup, timeout, setup=None):
+    server = Server(params["worker_class"], params["workers"], params["threads"], timeout)
+    try:
+        server.wait_ready()
+        if setup:
+            # The "exams" scenario matches against a stored schedule, upload it first
+            _, statuses, _ = drive(server.port, "/parse", [setup], 1, 0, timeout, requests=1)
+            if 200 not in statuses:
+                raise RuntimeError(f"Uploading the doctors schedule failed: {statuses}")
+        if warmup:
+            # A few requests first, so the run measures steady state
+            drive(server.port, path, payloads, params["concurrency"], warmup, timeout)
+        latencies, statuses, seconds = drive(server.port, path, payloads, params["concurrency"], duration, timeout)
+        memory = server.memory()
+    finally:
+        server.stop()
+
+    latencies.sort()
+    ok = len(latencies)
+    record = {
+        "benchmark": "loadtest",
+        "params": params,
+        "requests": sum(statuses.values()),
+        "ok": ok,
+        "errors": {str(k): v for k, v in statuses.items() if k != 200},
+        "wrong_doctors": statuses.get("wrong_doctors", 0),
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(ok / seconds, 2) if seconds else None,
+    }
+    for name, p in (("p50_s", 50), ("p95_s", 95), ("p99_s", 99)):
+        record[name] = percentile(latencies, p)
+    record["max_s"] = latencies[-1] if latencies else None
+    record["mean_s"] = statistics.fmean(latencies) if latencies else None
+    record["worker_memory"] = list(memory.values())
+    if memory:
+        record["max_worker_peak_rss_mb"] = max(m["peak_rss_mb"] for m in memory.values())
+    return record
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", default="full", choices=sorted(SCENARIOS))
+    ap.add_argument("--worker-class", default="sync,gthread", help="comma-separated gunicorn worker classes")
+    ap.add_argument("--workers", type=int_list, default=[1, 2])
+    ap.add_argument("--threads", type=int_list, default=[4], help="threads per worker (gthread)")
+    ap.add_argument("--concurrency", type=int_list, default=[1, 8], help="client threads")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    ap.add_argument("--warmup", type=float, default=2.0, help="untimed seconds of load before each run")
+    ap.add_argument("--variants", type=int, default=8, help="different file pairs to cycle through")
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--exams", type=int, default=200)
+    ap.add_argument("--timeout", type=float, default=120, help="request / gunicorn worker timeout")
+    ap.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    setup = stored = None
+    if args.scenario == "exams":
+        stored = doctors_pdf(args.pages, doctors=max(args.pages // 2, 1))
+        setup = (*multipart({"pdf_file": ("doctors.pdf", stored)}), frozenset(parse_doctors_pdf(stored)))
+    path, payloads = build_payloads(args.scenario, args.variants, args.pages, args.exams, stored)
+    out = open_output(args.output)
+    classes = [c for c in args.worker_class.split(",") if c]
+    for params in grid(worker_class=classes, workers=args.workers, threads=args.threads,
+                       concurrency=args.concurrency):
+        # Threads only mean something to gthread
+        if params["worker_class"] != "gthread" and params["threads"] != args.threads[0]:
+            continue
+        params.update(scenario=args.scenario, pages=args.pages, exams=args.exams, variants=args.variants)
+        try:
+            record = run(params, payloads, path, args.duration, args.warmup, args.timeout, setup)
+        except RuntimeError as e:
+            # e.g. a worker class whose package isn't installed
+            record = {"benchmark": "loadtest", "params": params, "error": str(e)}
+        emit(out, record)
+
+
+if __name__ == "__main__":
+    main()
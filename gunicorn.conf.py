@@ -0,0 +1,30 @@
+# gunicorn settings, the Procfile points here. Workers, bind address etc. keep
+# gunicorn's defaults (WEB_CONCURRENCY, PORT, GUNICORN_CMD_ARGS).
+import os
+
+# Import the app (and warm it up) once in the master, workers are forked already warm
+# and share those pages copy-on-write. GUNICORN_PRELOAD=0 warms up each worker instead.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+# WARM_UP=0 skips the warm-up entirely
+warm_up_enabled = os.environ.get('WARM_UP', '1') != '0'
+
+
+def _warm_up(log, app):
+    from utils.warmup import warm_up
+    try:
+        timings = warm_up(app)
+    except Exception as e:
+        # A failed warm-up only costs the first request some time, keep serving
+        log.warning("Warm-up failed: %s", e)
+        return
+    log.info("Warm-up done: %s", timings)
+
+
+def when_ready(server):
+    if preload_app and warm_up_enabled:
+        _warm_up(server.log, server.app.wsgi())
+
+
+def post_worker_init(worker):
+    if not preload_app and warm_up_enabled:
+        _warm_up(worker.log, worker.wsgi)
@@ -79,8 +79,21 @@ document.addEventListener('DOMContentLoaded', () => {
         else el.classList.add('hidden');
     }
 
+    // A doctors schedule uploaded before is kept on the server, so the PDF is optional then
+    let storedDoctors = 0;
+    fetch('/doctors?limit=0')
+        .then(response => response.json())
+        .then(data => {
+            storedDoctors = data.count || 0;
+            if (storedDoctors) {
+                dropZonePdf.querySelector('p').textContent = `Stored: ${storedDoctors} doctors (upload to replace)`;
+                checkReady();
+            }
+        })
+        .catch(() => {});
+
     function checkReady() {
-        if (pdfFile && docxFile) {
+        if (docxFile && (pdfFile || storedDoctors)) {
             processBtn.removeAttribute('disabled');
         } else {
             // Optional: If you want to allow single file processing, logic here. 
@@ -112,15 +125,16 @@ document.addEventListener('DOMContentLoaded', () => {
         if (pdfFile) formData.append('pdf_file', pdfFile);
         if (docxFile) formData.append('docx_file', docxFile);
 
-        fetch('/parse', {
-            method: 'POST',
-            body: formData
-        })
-            .then(response => response.json())
-            .then(data => {
-                if (data.error) throw new Error(data.error);
-                renderResults(data.data);
-            })
+        // Big uploads go through the background job API so the request doesn't time out,
+        // otherwise results are streamed and rendered as they are matched
+        const totalSize = (pdfFile ? pdfFile.size : 0) + (docxFile ? docxFile.size : 0);
+        let request;
+        if (totalSize > ASYNC_UPLOAD_BYTES) request = runJob(formData);
+        else if (docxFile && window.ReadableStream) request = runStream(formData);
+        else request = runParse(formData);
+
+        request
+            .then(data => { if (data) renderResults(data); })
             .catch(err => {
                 showError(err.message);
                 // Reset UI slightly
@@ -130,60 +144,226 @@ document.addEventListener('DOMContentLoaded', () => {
             });
     });
 
-    function renderResults(data) {
+    const ASYNC_UPLOAD_BYTES = 2 * 1024 * 1024;
+    const JOB_POLL_MS = 1000;
+    const loadingText = loadingState.querySelector('p');
+
+    // Reads /parse/stream line by line and renders each exam as it arrives.
+    // Resolves with null once everything is on screen.
+    function runStream(formData) {
+        return fetch('/parse/stream', {
+            method: 'POST',
+            body: formData
+        }).then(response => {
+            if (!response.ok) return response.json().then(data => { throw new Error(data.error); });
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let list = null;
+
+            const handleLine = (line) => {
+                if (!line.trim()) return;
+                const msg = JSON.parse(line);
+                if (msg.type === 'error') throw new Error(msg.error);
+                if (msg.type === 'meta') {
+                    showResults();
+                    list = createCard("Exam Proctoring Schedule", '');
+                } else if (msg.type === 'match') {
+                    currentMatches.push(msg.exam);
+                    list.insertAdjacentHTML('beforeend', examHTML(msg.exam));
+                } else if (msg.type === 'conflicts') {
+                    renderConflicts(msg.conflicts, currentMatches);
+                }
+            };
+
+            const read = () => reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handleLine);
+                if (done) {
+                    handleLine(buffer);
+                    return null;
+                }
+                return read();
+            });
+            return read();
+        });
+    }
+
+    function runParse(formData) {
+        return fetch('/parse', {
+            method: 'POST',
+            body: formData
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) throw new Error(data.error);
+                return data.data;
+            });
+    }
+
+    function runJob(formData) {
+        return fetch('/jobs', {
+            method: 'POST',
+            body: formData
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) throw new Error(data.error);
+                return pollJob(data.status_url);
+            });
+    }
+
+    function pollJob(url) {
+        return new Promise((resolve, reject) => {
+            const poll = () => {
+                fetch(url)
+                    .then(response => response.json())
+                    .then(job => {
+                        if (job.status === 'error' || job.error) throw new Error(job.error || 'Job failed');
+                        if (job.status === 'done') {
+                            resolve(job.data);
+                            return;
+                        }
+                        updateProgress(job.progress || {});
+                        setTimeout(poll, JOB_POLL_MS);
+                    })
+                    .catch(reject);
+            };
+            poll();
+        });
+    }
+
+    function updateProgress(progress) {
+        if (progress.stage === 'pages') {
+            loadingText.textContent = `Parsing doctor schedule... ${progress.pages_parsed}/${progress.pages_total} pages`;
+        } else if (progress.stage === 'exams') {
+            loadingText.textContent = `Matching exams... ${progress.exams_matched}/${progress.exams_total}`;
+        }
+    }
+
+    function showResults() {
         loadingState.classList.add('hidden');
         uploadSection.classList.add('hidden');
         resultsSection.classList.remove('hidden');
 
-        const container = document.querySelector('.results-section');
         // Clear previous cards, preserve header/reset button
-        const existingCards = container.querySelectorAll('.instructor-card');
+        const existingCards = resultsSection.querySelectorAll('.instructor-card, .export-bar');
         existingCards.forEach(c => c.remove());
+        currentMatches = [];
+        createExportBar();
+    }
 
-        // Helper to add card
-        const createCard = (title, contentHTML) => {
-            const card = document.createElement('div');
-            card.className = 'instructor-card';
-            card.style.marginBottom = '30px';
-            card.innerHTML = `
-                <div class="card-header">
-                    <h2>${title}</h2>
+    // Matches on screen, for the export buttons
+    let currentMatches = [];
+
+    function createExportBar() {
+        const bar = document.createElement('div');
+        bar.className = 'export-bar';
+        bar.style.cssText = 'display:flex; gap:10px; margin-bottom:2rem;';
+        [['csv', 'CSV'], ['xlsx', 'Excel'], ['ics', 'Calendar']].forEach(([fmt, label]) => {
+            const btn = document.createElement('button');
+            btn.className = 'btn-secondary';
+            btn.style.marginBottom = '0';
+            btn.innerHTML = `<i class="ph ph-download-simple"></i> ${label}`;
+            btn.addEventListener('click', () => exportMatches(fmt));
+            bar.appendChild(btn);
+        });
+        resultsSection.appendChild(bar);
+    }
+
+    function exportMatches(fmt) {
+        if (!currentMatches.length) return;
+        fetch(`/export/${fmt}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ matches: currentMatches })
+        })
+            .then(response => {
+                if (!response.ok) return response.json().then(data => { throw new Error(data.error); });
+                return response.blob();
+            })
+            .then(blob => {
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(blob);
+                link.download = `exam-schedule.${fmt}`;
+                link.click();
+                URL.revokeObjectURL(link.href);
+            })
+            .catch(err => showError(err.message));
+    }
+
+    // Adds a card to the results and returns its body, so items can be appended later
+    function createCard(title, contentHTML) {
+        const card = document.createElement('div');
+        card.className = 'instructor-card';
+        card.style.marginBottom = '30px';
+        card.innerHTML = `
+            <div class="card-header">
+                <h2>${title}</h2>
+            </div>
+            <div class="schedule-grid" style="display:block; padding: 1.5rem;">
+                ${contentHTML}
+            </div>
+        `;
+        resultsSection.appendChild(card);
+        return card.querySelector('.schedule-grid');
+    }
+
+    function examHTML(exam) {
+        const docs = exam.available_doctors || [];
+        const docsBadges = docs.length > 0
+            ? docs.map(d => `<span class="badge" style="background:#e0f2f1; color:#00695c; margin:2px;">${d}</span>`).join(' ')
+            : '<span style="color:#e74c3c; font-weight: bold;">⚠️ No Doctors Available</span>';
+
+        return `
+            <div class="item-card" style="margin-bottom:1rem;">
+                <div class="item-header">
+                    <strong>${exam.course_name}</strong>
+                    <span>${exam.date || ''} (${exam.day_of_week || '?'})</span>
                 </div>
-                <div class="schedule-grid" style="display:block; padding: 1.5rem;">
-                    ${contentHTML}
+                <div style="margin-bottom: 8px;">
+                    <i class="ph ph-clock"></i> ${exam.raw_time}
+                </div>
+                ${exam.room ? `<div style="margin-bottom: 8px;"><i class="ph ph-building"></i> القاعة: ${exam.room}</div>` : ''}
+                ${exam.section ? `<div style="margin-bottom: 8px;"><i class="ph ph-user-list"></i> الشعبة: ${exam.section}</div>` : ''}
+                <div>
+                    <strong>Available Proctors:</strong>
+                    <div style="margin-top:5px;">${docsBadges}</div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Room double-bookings / overlapping sittings, each naming its two exams
+    function renderConflicts(conflicts, exams) {
+        if (!conflicts || !conflicts.length) return;
+        const label = { room: 'القاعة', section: 'الشعبة' };
+        const items = conflicts.map(c => {
+            const names = c.exams.map(i => (exams[i] || {}).course_name || `#${i + 1}`).join(' ↔ ');
+            return `
+                <div class="item-card" style="margin-bottom:1rem;">
+                    <div class="item-header">
+                        <strong>${label[c.kind] || c.kind}: ${c.key}</strong>
+                        <span>${c.date} ${c.start}-${c.end}</span>
+                    </div>
+                    <div>${names}</div>
                 </div>
             `;
-            container.appendChild(card);
-        };
+        }).join('');
+        createCard(`⚠️ Conflicts (${conflicts.length})`, items);
+    }
+
+    function renderResults(data) {
+        showResults();
+        renderConflicts(data.conflicts, data.exams || []);
 
         // 1. Matches (The main goal)
         if (data.matches) {
-            let html = '';
-            data.matches.forEach(exam => {
-                const docs = exam.available_doctors || [];
-                const docsBadges = docs.length > 0
-                    ? docs.map(d => `<span class="badge" style="background:#e0f2f1; color:#00695c; margin:2px;">${d}</span>`).join(' ')
-                    : '<span style="color:#e74c3c; font-weight: bold;">⚠️ No Doctors Available</span>';
-
-                html += `
-                    <div class="item-card" style="margin-bottom:1rem;">
-                        <div class="item-header">
-                            <strong>${exam.course_name}</strong>
-                            <span>${exam.date || ''} (${exam.day_of_week || '?'})</span>
-                        </div>
-                        <div style="margin-bottom: 8px;">
-                            <i class="ph ph-clock"></i> ${exam.raw_time}
-                        </div>
-                        ${exam.room ? `<div style="margin-bottom: 8px;"><i class="ph ph-building"></i> القاعة: ${exam.room}</div>` : ''}
-                        ${exam.section ? `<div style="margin-bottom: 8px;"><i class="ph ph-user-list"></i> الشعبة: ${exam.section}</div>` : ''}
-                        <div>
-                            <strong>Available Proctors:</strong>
-                            <div style="margin-top:5px;">${docsBadges}</div>
-                        </div>
-                    </div>
-                `;
-            });
-            createCard("Exam Proctoring Schedule", html);
+            currentMatches = data.matches;
+            createCard("Exam Proctoring Schedule", data.matches.map(examHTML).join(''));
         }
 
         // 2. Fallback: Doctors List (PDF Only)
@@ -0,0 +1,309 @@
+import time
+
+from utils.parser import time_to_min
+
+SOURCE, SINK = 0, 1
+
+
+def assign_proctors(matches, proctors_per_exam=1, max_load=None, time_budget=5.0):
+    """
+    Picks concrete proctors for each exam out of its "available_doctors" (the output
+    of check_availability).
+
+    proctors_per_exam is an int, or a function exam -> int (e.g. by room or section).
+    max_load caps the number of exams per doctor, and nobody gets two exams that
+    overlap on the same date. Exams whose weekday couldn't be resolved get nobody.
+
+    A greedy pass (scarcest exams first, least loaded doctors first) seeds a max-flow
+    over exam -> (doctor, overlap group) -> doctor, which fills as many seats as
+    possible. If time_budget seconds run out the flow stops where it is; the result is
+    still valid, just maybe not the best ("complete": False in the stats).
+
+    Returns {"assignments": [...], "loads": {doctor: exams}, "stats": {...}}, with one
+    assignment per exam, in order: the exam plus "proctors", "required" and "unfilled".
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget if time_budget is not None else None
+
+    exams = list(matches)
+    available = [_candidates(exam) for exam in exams]
+    required = [_required(proctors_per_exam, exam) for exam in exams]
+    intervals = [_interval(exam) for exam in exams]
+    groups = _overlap_groups(exams, intervals)
+
+    doctors = {}
+    for candidates in available:
+        for name in candidates:
+            doctors.setdefault(name, len(doctors))
+    names = list(doctors)
+    load_cap = max_load if max_load is not None else len(exams)
+
+    flow = _FlowNetwork(len(exams), len(names))
+    for i, exam in enumerate(exams):
+        flow.add_exam(i, required[i])
+        for name in available[i]:
+            flow.add_candidate(i, groups[i], doctors[name])
+    for d in range(len(names)):
+        flow.add_doctor(d, load_cap)
+
+    # Greedy seed, so even a zero time budget gives a sensible assignment
+    order = sorted(range(len(exams)), key=lambda i: (len(available[i]) / max(required[i], 1), i))
+    loads = [0] * len(names)
+    for i in order:
+        candidates = sorted((doctors[name] for name in available[i]), key=lambda d: (loads[d], d))
+        for d in candidates:
+            if flow.seats_left(i) == 0:
+                break
+            if loads[d] < load_cap and flow.push(i, groups[i], d):
+                loads[d] += 1
+
+    complete = flow.max_flow(deadline)
+
+    # The flow keeps one exam per doctor per overlap group. Drop the rare clashes across
+    # groups, then fill what's left with the exact rule: no overlap with the doctor's
+    # other exams that date.
+    proctors = [[names[d] for d in flow.assigned(i)] for i in range(len(exams))]
+    _drop_clashes(proctors, intervals)
+    loads = {name: 0 for name in names}
+    booked = {name: [] for name in names}
+    for i, assigned in enumerate(proctors):
+        for name in assigned:
+            loads[name] += 1
+            booked[name].append(i)
+
+    for i in order:
+        for name in sorted(available[i], key=lambda n: (loads[n], doctors[n])):
+            if len(proctors[i]) >= required[i]:
+                break
+            if name in proctors[i] or loads[name] >= load_cap:
+                continue
+            if any(_overlaps(intervals[i], intervals[j]) for j in booked[name]):
+                continue
+            proctors[i].append(name)
+            loads[name] += 1
+            booked[name].append(i)
+
+    assignments = []
+    for i, exam in enumerate(exams):
+        assignments.append(dict(exam, proctors=proctors[i], required=required[i],
+                                unfilled=max(required[i] - len(proctors[i]), 0)))
+
+    total_required = sum(required)
+    total_assigned = sum(min(len(p), r) for p, r in zip(proctors, required))
+    return {
+        "assignments": assignments,
+        "loads": loads,
+        "stats": {
+            "exams": len(exams),
+            "required": total_required,
+            "assigned": total_assigned,
+            "unfilled": total_required - total_assigned,
+            "complete": complete,
+            "seconds": time.perf_counter() - started,
+        },
+    }
+
+
+def _candidates(exam):
+    # check_availability lists "Unknown Date/Day" when it couldn't resolve the weekday
+    if not exam.get("day_of_week"):
+        return []
+    return exam.get("available_doctors", [])
+
+
+def _required(proctors_per_exam, exam):
+    n = proctors_per_exam(exam) if callable(proctors_per_exam) else proctors_per_exam
+    return max(int(n), 0)
+
+
+def _interval(exam):
+    # (date key, start, end); exams with no date or weekday never clash with anything
+    key = exam.get("date") or exam.get("day_of_week")
+    try:
+        return key, time_to_min(exam["start"]), time_to_min(exam["end"])
+    except (KeyError, ValueError):
+        return None, 0, 0
+
+
+def _overlaps(a, b):
+    return a[0] is not None and a[0] == b[0] and a[1] < b[2] and a[2] > b[1]
+
+
+def _overlap_groups(exams, intervals):
+    """
+    Group id per exam: on each date, exams are partitioned into groups that all share
+    a common moment (sweep by end time), so a doctor can take at most one exam per
+    group. Exams sharing a period always land in the same group; two overlapping
+    exams in different groups are caught by _drop_clashes.
+    """
+    groups = [None] * len(exams)
+    by_date = {}
+    for i, (key, start, end) in enumerate(intervals):
+        if key is None:
+            groups[i] = ("single", i)
+        else:
+            by_date.setdefault(key, []).append((end, start, i))
+
+    for key, items in by_date.items():
+        items.sort()
+        # The earliest-ending unassigned exam ends at the stabbing point: every unassigned
+        # exam starting before it contains the moment just before that end
+        by_start = sorted(items, key=lambda item: item[1])
+        k = 0
+        for end, start, i in items:
+            if groups[i] is not None:
+                continue
+            group = groups[i] = (key, i)
+            while k < len(by_start) and by_start[k][1] < end:
+                j = by_start[k][2]
+                if groups[j] is None:
+                    groups[j] = group
+                k += 1
+    return groups
+
+
+def _drop_clashes(proctors, intervals):
+    """
+    Removes the later of any two overlapping exams given to the same doctor.
+    """
+    by_doctor = {}
+    for i, assigned in enumerate(proctors):
+        for name in assigned:
+            by_doctor.setdefault(name, []).append(i)
+
+    for name, exam_ids in by_doctor.items():
+        exam_ids.sort(key=lambda i: (intervals[i][0] or "", intervals[i][1], intervals[i][2]))
+        kept = []
+        for i in exam_ids:
+            if any(_overlaps(intervals[i], intervals[j]) for j in kept):
+                proctors[i].remove(name)
+            else:
+                kept.append(i)
+
+
+class _FlowNetwork:
+    """
+    source -> exam (seats) -> (doctor, group) (1) -> doctor (1) -> sink (max load),
+    solved with Dinic's algorithm on flat edge arrays.
+    """
+
+    def __init__(self, exam_count, doctor_count):
+        self.to = []
+        self.cap = []
+        self.adj = [[] for _ in range(2 + exam_count + doctor_count)]
+        self.doctor_base = 2 + exam_count
+        self.exam_edges = [None] * exam_count   # source -> exam edge
+        self.groups = {}                        # (doctor, group) -> node
+        self.candidate_edges = {}               # (exam, doctor) -> exam -> group edge
+        self.group_edges = {}                   # group node -> group -> doctor edge
+        self.group_doctor = {}                  # group node -> doctor index
+        self.doctor_edges = [None] * doctor_count
+
+    def _node(self):
+        self.adj.append([])
+        return len(self.adj) - 1
+
+    def _edge(self, u, v, cap):
+        self.adj[u].append(len(self.to))
+        self.to.append(v)
+        self.cap.append(cap)
+        self.adj[v].append(len(self.to))
+        self.to.append(u)
+        self.cap.append(0)
+        return len(self.to) - 2
+
+    def add_exam(self, i, seats):
+        self.exam_edges[i] = self._edge(SOURCE, 2 + i, seats)
+
+    def add_candidate(self, i, group, d):
+        if (i, d) in self.candidate_edges:
+            return
+        node = self.groups.get((d, group))
+        if node is None:
+            node = self.groups[(d, group)] = self._node()
+            self.group_edges[node] = self._edge(node, self.doctor_base + d, 1)
+            self.group_doctor[node] = d
+        self.candidate_edges[(i, d)] = self._edge(2 + i, node, 1)
+
+    def add_doctor(self, d, load_cap):
+        self.doctor_edges[d] = self._edge(self.doctor_base + d, SINK, load_cap)
+
+    def seats_left(self, i):
+        return self.cap[self.exam_edges[i]]
+
+    def push(self, i, group, d):
+        # One unit along source -> exam -> group -> doctor -> sink, if every edge has room
+        node = self.groups[(d, group)]
+        path = (self.exam_edges[i], self.candidate_edges[(i, d)], self.group_edges[node], self.doctor_edges[d])
+        if any(self.cap[e] <= 0 for e in path):
+            return False
+        for e in path:
+            self.cap[e] -= 1
+            self.cap[e ^ 1] += 1
+        return True
+
+    def assigned(self, i):
+        # Doctors carrying flow out of exam i
+        doctors = []
+        for e in self.adj[2 + i]:
+            if e % 2 == 0 and self.cap[e] == 0 and self.cap[e ^ 1] > 0:
+                doctors.append(self.group_doctor[self.to[e]])
+        return doctors
+
+    def max_flow(self, deadline=None):
+        """
+        Augments to a maximum flow. Returns False if the deadline cut it short.
+        """
+        to, cap, adj = self.to, self.cap, self.adj
+        n = len(adj)
+
+        while True:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+
+            # BFS levels from the source over residual edges
+            level = [-1] * n
+            level[SOURCE] = 0
+            queue = [SOURCE]
+            for u in queue:
+                for e in adj[u]:
+                    if cap[e] > 0 and level[to[e]] < 0:
+                        level[to[e]] = level[u] + 1
+                        queue.append(to[e])
+            if level[SINK] < 0:
+                return True
+
+            # Unit augmenting paths along the level graph (iterative DFS)
+            it = [0] * n
+            pushed = 0
+            while True:
+                path = []
+                u = SOURCE
+                while u != SINK:
+                    edges = adj[u]
+                    while it[u] < len(edges):
+                        e = edges[it[u]]
+                        if cap[e] > 0 and level[to[e]] == level[u] + 1:
+                            break
+                        it[u] += 1
+                    if it[u] == len(edges):
+                        # Dead end, retreat
+                        if not path:
+                            break
+                        level[u] = -1
+                        e = path.pop()
+                        u = to[e ^ 1]
+                        it[u] += 1
+                        continue
+                    e = edges[it[u]]
+                    path.append(e)
+                    u = to[e]
+                if u != SINK:
+                    break
+
+                for e in path:
+                    cap[e] -= 1
+                    cap[e ^ 1] += 1
+                pushed += 1
+                if pushed % 256 == 0 and deadline is not None and time.perf_counter() > deadline:
+                    return False
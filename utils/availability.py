@@ -0,0 +1,233 @@
+from bisect import bisect_right
+
+from utils.model import DoctorsDB, Weekday, WEEKDAY_KEYS
+from utils.parser import time_to_min
+
+np = None  # numpy, imported by the numpy engine on first use (it's slow to import)
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for the numpy availability engine") from None
+        np = numpy
+    return np
+
+
+class BusyIndex:
+    """
+    Per-weekday index over every doctor's busy slots, built once per doctors DB.
+
+    Each weekday's busy intervals are cut into elementary segments at every start/end
+    boundary, and each segment stores a bitmask of the doctors busy during it. An exam
+    then only ORs the handful of segments it overlaps instead of scanning every slot.
+    Overlap is the same as check_availability: start < b_end and end > b_start.
+    """
+
+    def __init__(self, doctors_db):
+        db = DoctorsDB.coerce(doctors_db)
+        self.names = db.names
+        self._positions = {name: idx for idx, name in enumerate(self.names)}
+        self._days = {}
+
+        intervals_by_day = {day.key: [] for day in Weekday}
+        for idx, doctor in enumerate(db):
+            bit = 1 << idx
+            for day in Weekday:
+                intervals = intervals_by_day[day.key]
+                for b_start, b_end in doctor.slots(day):
+                    intervals.append((b_start, b_end, bit))
+
+        for day, intervals in intervals_by_day.items():
+            self._days[day] = (intervals,) + self._build_segments(intervals)
+
+    @staticmethod
+    def _build_segments(intervals):
+        # Sweep over start/end events keeping a per-doctor count of open intervals.
+        # Zero-length (or reversed) slots can't be cut into segments, keep them aside.
+        events = {}
+        odd = []
+        for s, e, bit in intervals:
+            if s < e:
+                events.setdefault(s, []).append((bit, 1))
+                events.setdefault(e, []).append((bit, -1))
+            else:
+                odd.append((s, e, bit))
+
+        bounds = sorted(events)
+        masks = []
+        open_counts = {}
+        mask = 0
+        for point in bounds:
+            for bit, delta in events[point]:
+                count = open_counts.get(bit, 0) + delta
+                open_counts[bit] = count
+                if count:
+                    mask |= bit
+                else:
+                    mask &= ~bit
+            masks.append(mask)  # Busy mask for [point, next point)
+
+        return bounds, masks, odd
+
+    def busy_mask(self, day, start_min, end_min):
+        """
+        Bitmask (by doctor position) of the doctors busy at some point in [start, end) on day.
+        """
+        entry = self._days.get(day)
+        if entry is None:
+            return 0
+        intervals, bounds, masks, odd = entry
+
+        if start_min >= end_min:
+            # Zero-length exam, not covered by the segments. Check slots directly.
+            busy = 0
+            for s, e, bit in intervals:
+                if start_min < e and end_min > s:
+                    busy |= bit
+            return busy
+
+        busy = 0
+        for s, e, bit in odd:
+            if start_min < e and end_min > s:
+                busy |= bit
+
+        k = max(bisect_right(bounds, start_min) - 1, 0)
+        while k < len(bounds) and bounds[k] < end_min:
+            busy |= masks[k]
+            k += 1
+
+        return busy
+
+    def free_doctors(self, day, start_min, end_min):
+        """
+        Names of the doctors with no busy slot overlapping [start, end) on day, in DB order.
+        """
+        busy = self.busy_mask(day, start_min, end_min)
+        if not busy:
+            return list(self.names)
+
+        bits = format(busy, f"0{len(self.names)}b")[::-1]
+        return [name for name, b in zip(self.names, bits) if b == "0"]
+
+    def is_free(self, name, day, start_min, end_min):
+        """
+        True if the doctor has no busy slot overlapping [start, end) on day.
+        """
+        return not (self.busy_mask(day, start_min, end_min) >> self._positions[name]) & 1
+
+
+class BusyMatrix:
+    """
+    Dense [doctor, weekday, time-slot] boolean encoding of the doctors DB (numpy engine).
+
+    A per-doctor prefix sum over the time axis turns "is doctor d busy anywhere in
+    [start, end)" into one subtraction, so a whole exams x doctors availability matrix
+    is a couple of array operations. With resolution=1 (minutes) it matches
+    check_availability exactly; coarser buckets treat a partly busy bucket as busy.
+    """
+
+    def __init__(self, doctors_db, resolution=1):
+        _load_numpy()
+
+        db = DoctorsDB.coerce(doctors_db)
+        self.names = db.names
+        self.resolution = resolution
+        self.days = {key: i for i, key in enumerate(WEEKDAY_KEYS)}
+
+        # The model already holds flat [start, end, ...] minute arrays, no string parsing here
+        doc_idx, day_idx, flat = [], [], []
+        for d, doctor in enumerate(db):
+            for w, arr in enumerate(doctor.busy):
+                n = len(arr) // 2
+                doc_idx.append(np.full(n, d, dtype=np.intp))
+                day_idx.append(np.full(n, w, dtype=np.intp))
+                flat.append(np.frombuffer(arr, dtype=np.uint16) if n else np.empty(0, dtype=np.uint16))
+
+        doc_idx = np.concatenate(doc_idx) if doc_idx else np.empty(0, dtype=np.intp)
+        day_idx = np.concatenate(day_idx) if day_idx else np.empty(0, dtype=np.intp)
+        flat = np.concatenate(flat).astype(np.int64) if flat else np.empty(0, dtype=np.int64)
+        starts, ends = flat[0::2], flat[1::2]
+
+        # Zero-length (or reversed) slots cover no bucket, they are checked directly
+        regular = starts < ends
+        odd = ~regular
+        self._odd = (doc_idx[odd], day_idx[odd], starts[odd], ends[odd])
+        self._intervals = (doc_idx, day_idx, starts, ends)
+
+        s_bucket = starts[regular] // resolution
+        e_bucket = -(-ends[regular] // resolution)
+        self.slots = int(e_bucket.max()) + 1 if e_bucket.size else 1
+
+        # Difference array along time, then cumsum: busy[d, w, t] > 0 while any slot is open
+        diff = np.zeros((len(self.names), len(self.days), self.slots + 1), dtype=np.int32)
+        np.add.at(diff, (doc_idx[regular], day_idx[regular], s_bucket), 1)
+        np.add.at(diff, (doc_idx[regular], day_idx[regular], e_bucket), -1)
+        busy = np.cumsum(diff, axis=2)[:, :, :self.slots] > 0
+
+        # prefix[d, w, t] = busy buckets before t
+        prefix_dtype = np.int16 if self.slots < np.iinfo(np.int16).max else np.int32
+        self.prefix = np.zeros((busy.shape[0], busy.shape[1], self.slots + 1), dtype=prefix_dtype)
+        np.cumsum(busy, axis=2, out=self.prefix[:, :, 1:])
+
+    def available(self, days, starts, ends):
+        """
+        Boolean matrix [exam, doctor], True where the doctor is free for the whole exam.
+        days are weekday keys, starts/ends exam minutes (one entry per exam).
+        """
+        n = len(days)
+        result = np.ones((n, len(self.names)), dtype=bool)
+        if n == 0 or not self.names:
+            return result
+
+        day_idx = np.array([self.days.get(day, -1) for day in days], dtype=np.intp)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        # Exams on a day nobody is busy stay all-free, zero-length exams are checked below
+        rows = (day_idx >= 0) & (starts < ends)
+        if rows.any():
+            w = day_idx[rows]
+            s = np.clip(starts[rows] // self.resolution, 0, self.slots)
+            e = np.clip(-(-ends[rows] // self.resolution), 0, self.slots)
+            busy = (self.prefix[:, w, e] - self.prefix[:, w, s]) > 0  # [doctor, exam]
+            result[rows] = ~busy.T
+
+        odd_docs, odd_days, odd_starts, odd_ends = self._odd
+        for d, w, b_s, b_e in zip(odd_docs, odd_days, odd_starts, odd_ends):
+            clash = (day_idx == w) & (starts < b_e) & (ends > b_s) & (starts < ends)
+            result[clash, d] = False
+
+        for i in np.flatnonzero((day_idx >= 0) & (starts >= ends)):
+            result[i] = self._available_direct(day_idx[i], starts[i], ends[i])
+
+        return result
+
+    def _available_direct(self, w, start_min, end_min):
+        # Zero-length exam: plain overlap test against every slot of that weekday
+        doc_idx, day_idx, starts, ends = self._intervals
+        clash = (day_idx == w) & (start_min < ends) & (end_min > starts)
+        free = np.ones(len(self.names), dtype=bool)
+        free[doc_idx[clash]] = False
+        return free
+
+
+def availability_matrix(exams, doctors_db, resolution=1):
+    """
+    Exams x doctors availability via BusyMatrix. Returns (doctor names, bool matrix);
+    rows of exams without a resolved weekday ("day_of_week") are all False.
+    """
+    matrix = BusyMatrix(doctors_db, resolution)
+
+    days, starts, ends = [], [], []
+    for exam in exams:
+        days.append(exam.get("day_of_week"))
+        starts.append(time_to_min(exam["start"]))
+        ends.append(time_to_min(exam["end"]))
+
+    result = matrix.available(days, starts, ends)
+    result[[not day for day in days]] = False
+    return matrix.names, result
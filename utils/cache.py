@@ -0,0 +1,135 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class ParseCache:
+    """
+    Two-tier cache of parse results, keyed by the SHA-256 of the uploaded file bytes.
+
+    The memory tier is an LRU of pickled results (so callers can't mutate what's cached),
+    the disk tier is one pickle file per key. Both are bounded by total bytes.
+    """
+
+    def __init__(self, directory, version, max_memory_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.version = str(version)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind, digest):
+        """
+        Cache key for a file: its kind ('pdf' / 'docx'), the parser version and the
+        SHA-256 hex digest of its bytes.
+        """
+        return hashlib.sha256(f"{kind}:{self.version}:{digest}".encode()).hexdigest()
+
+    def get_or_parse(self, kind, digest, parse):
+        """
+        Returns the cached result for this file digest, or calls parse() and caches what it returns.
+        """
+        key = self.key(kind, digest)
+        result = self.get(key)
+        if result is None:
+            result = parse()
+            self.put(key, result)
+        return result
+
+    def get(self, key):
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.counts["memory_hits"] += 1
+                return pickle.loads(blob)
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+            os.utime(path)  # Keep the disk tier in LRU order too
+        except OSError:
+            with self._lock:
+                self.counts["misses"] += 1
+            return None
+
+        with self._lock:
+            self.counts["disk_hits"] += 1
+            self._remember(key, blob)
+        return pickle.loads(blob)
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._remember(key, blob)
+
+        # Write then rename, other workers may be reading the same directory
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing parse cache: {e}")
+            return
+        self._evict_disk()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counts)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _remember(self, key, blob):
+        # Caller holds the lock
+        if len(blob) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = blob
+        self._memory_bytes += len(blob)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pkl'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        # Oldest first
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
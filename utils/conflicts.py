@@ -0,0 +1,118 @@
+"""
+Clash detection over the exam records of parse_exams_docx: two exams in the same
+room at overlapping times on the same date, or the same course section down for two
+overlapping sittings.
+
+Exams are grouped by (room or course section, date) and each group is swept in start
+order with a heap of the sittings still running, so finding the clashes is
+O(n log n + clashes) rather than comparing every pair of exams.
+"""
+import heapq
+from functools import lru_cache
+
+from utils.model import min_to_time
+from utils.parser import time_to_min
+
+# Kinds of clash reported by find_conflicts
+CONFLICT_KINDS = ("room", "section")
+
+def find_conflicts(exams, kinds=CONFLICT_KINDS):
+    """
+    Overlapping pairs of exams, as dicts:
+    {"kind": "room", "key": room, "date", "start", "end", "exams": [i, j]}
+    where i < j are indexes into `exams` and start/end is the overlap. For "section"
+    the key is "course_name / section".
+
+    Exams without a date, a room (for "room") or a valid start < end are skipped.
+    Sections of the same course sharing a room at the same time is a normal
+    combined sitting, so those aren't reported as room clashes.
+    Sorted by date, start and kind.
+    """
+    groups = {}
+    courses = []
+    spans = {}  # (start, end) text -> minutes, a timetable only has a few dozen
+    check_rooms = "room" in kinds
+    check_sections = "section" in kinds
+    for i, exam in enumerate(exams):
+        course = _normalize(exam.get("course_name"))
+        courses.append(course)
+        date = (exam.get("date") or "").strip()
+        if not date:
+            continue
+        span = (exam.get("start") or "", exam.get("end") or "")
+        if span not in spans:
+            spans[span] = (time_to_min(span[0]), time_to_min(span[1]))
+        start, end = spans[span]
+        if start >= end:
+            continue
+
+        if check_rooms:
+            room = _normalize(exam.get("room"))
+            if room:
+                groups.setdefault(("room", room, date), []).append((start, end, i))
+        if check_sections and course:
+            groups.setdefault(("section", course, _normalize(exam.get("section")), date), []).append((start, end, i))
+
+    conflicts = []
+    date_keys = {}
+    for group, sittings in groups.items():
+        if len(sittings) < 2:
+            continue
+        kind, date = group[0], group[-1]
+        # Reported under the spelling of the group's first exam
+        first = exams[sittings[0][2]]
+        if kind == "room":
+            key = _spaced(first.get("room"))
+        else:
+            key = f"{_spaced(first.get('course_name'))} / {_spaced(first.get('section'))}"
+        if date not in date_keys:
+            date_keys[date] = _date_key(date)
+
+        for start, end, i, j in _overlapping(sittings):
+            if kind == "room" and courses[i] == courses[j]:
+                continue
+            conflicts.append({
+                "kind": kind,
+                "key": key,
+                "date": date,
+                "start": min_to_time(start),
+                "end": min_to_time(end),
+                "exams": [i, j] if i < j else [j, i],
+            })
+
+    conflicts.sort(key=lambda c: (date_keys[c["date"]], c["start"], c["kind"], c["exams"]))
+    return conflicts
+
+
+def _overlapping(sittings):
+    # Sweep in start order; everything still running when a sitting starts overlaps it.
+    # Touching sittings (one ends as the next starts) don't clash.
+    sittings.sort()
+    running = []  # heap of (end, start, index)
+    for start, end, i in sittings:
+        while running and running[0][0] <= start:
+            heapq.heappop(running)
+        for other_end, _, j in running:
+            yield start, min(end, other_end), j, i
+        heapq.heappush(running, (end, start, i))
+
+
+def _spaced(value):
+    return " ".join(str(value or "").split())
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text(text):
+    return " ".join(text.split()).casefold()
+
+
+def _normalize(value):
+    return _normalize_text(str(value or ""))
+
+
+def _date_key(date):
+    # DD/MM/YYYY sorts by (year, month, day); anything else goes last, as is
+    parts = date.split("/")
+    if len(parts) == 3 and all(p.isdigit() for p in parts):
+        return (0, int(parts[2]), int(parts[1]), int(parts[0]))
+    return (1, date)
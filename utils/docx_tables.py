@@ -0,0 +1,138 @@
+"""
+Streaming reader for the tables of a .docx file.
+
+Reads word/document.xml incrementally instead of building python-docx's object tree,
+so a timetable with thousands of rows is read one row at a time. Cell texts come out
+the same as python-docx's row.cells / cell.text.
+"""
+import zipfile
+import posixpath
+from xml.etree.ElementTree import iterparse, ParseError
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+BODY, TBL, TR, TC, P = W + 'body', W + 'tbl', W + 'tr', W + 'tc', W + 'p'
+R, HYPERLINK = W + 'r', W + 'hyperlink'
+TCPR, TRPR = W + 'tcPr', W + 'trPr'
+GRID_SPAN, V_MERGE, GRID_BEFORE = W + 'gridSpan', W + 'vMerge', W + 'gridBefore'
+VAL, BR_TYPE = W + 'val', W + 'type'
+
+OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RELATIONSHIPS = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+# Errors that mean "not a readable .docx"
+READ_ERRORS = (zipfile.BadZipFile, KeyError, ParseError, OSError)
+
+
+def _run_text(elem):
+    # Same mapping as python-docx's CT_R.text
+    tag = elem.tag
+    if tag == W + 't':
+        return elem.text or ""
+    if tag in (W + 'tab', W + 'ptab'):
+        return "\t"
+    if tag == W + 'cr':
+        return "\n"
+    if tag == W + 'br':
+        return "\n" if elem.get(BR_TYPE, 'textWrapping') == 'textWrapping' else ""
+    if tag == W + 'noBreakHyphen':
+        return "-"
+    return ""
+
+
+def _document_part(zf):
+    # The main part is usually word/document.xml, but the package relationships say for sure
+    try:
+        with zf.open('_rels/.rels') as f:
+            for _, elem in iterparse(f):
+                if elem.tag == RELATIONSHIPS and elem.get('Type') == OFFICE_DOCUMENT:
+                    return posixpath.normpath(elem.get('Target').lstrip('/'))
+    except (KeyError, ParseError):
+        pass
+    return 'word/document.xml'
+
+
+def iter_table_rows(source):
+    """
+    Yields (table_index, cells) for each row of each top-level table, in document order.
+    source is a path or a binary file-like object.
+
+    cells is a list of stripped cell texts like [cell.text.strip() for cell in row.cells]:
+    a cell spanning several grid columns repeats once per column, and a vertically
+    merged continuation cell repeats the cell above it.
+    Raises one of READ_ERRORS if the file is not a readable .docx.
+    """
+    with zipfile.ZipFile(source) as zf, zf.open(_document_part(zf)) as f:
+        stack = []
+        body = tbl = None
+        table_idx = -1
+
+        row, row_offsets, prev_offsets = [], {}, {}
+        offset = 0
+        paragraphs, para = [], []
+        span, v_merge = 1, None
+
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                stack.append(tag)
+                depth = len(stack)
+                if depth == 2 and tag == BODY:
+                    body = elem
+                elif depth == 3 and tag == TBL:
+                    tbl = elem
+                    table_idx += 1
+                    prev_offsets = {}
+                elif depth == 4 and tag == TR:
+                    row, row_offsets, offset = [], {}, 0
+                continue
+
+            depth = len(stack)
+            stack.pop()
+            if depth < 3 or stack[1] != BODY:
+                continue
+            if depth == 3:
+                # Body-level paragraph or table finished, free it
+                body.remove(elem)
+                continue
+            if stack[2] != TBL:
+                continue
+
+            if depth == 4:
+                if tag == TR:
+                    yield table_idx, row
+                    prev_offsets = row_offsets
+                tbl.remove(elem)
+                continue
+            if stack[3] != TR:
+                continue
+
+            if depth == 5:
+                if tag == TC:
+                    # A "continue" vMerge cell takes the (already resolved) cell above it
+                    cells = prev_offsets.get(offset) if v_merge == 'continue' else None
+                    if cells is None:
+                        cells = ["\n".join(paragraphs).strip()] * span
+                    row.extend(cells)
+                    row_offsets[offset] = cells
+                    offset += span
+                    paragraphs, span, v_merge = [], 1, None
+            elif stack[4] == TRPR:
+                if depth == 6 and tag == GRID_BEFORE:
+                    offset = int(elem.get(VAL, 0))
+            elif stack[4] != TC:
+                continue
+            elif depth == 6:
+                if tag == P:
+                    paragraphs.append("".join(para))
+                    para = []
+            elif stack[5] == TCPR:
+                if depth == 7 and tag == GRID_SPAN:
+                    span = int(elem.get(VAL, 1))
+                elif depth == 7 and tag == V_MERGE:
+                    v_merge = elem.get(VAL, 'continue')
+            elif stack[5] != P:
+                continue
+            elif depth == 8 and stack[6] == R:
+                para.append(_run_text(elem))
+            elif depth == 9 and stack[6] == HYPERLINK and stack[7] == R:
+                para.append(_run_text(elem))
@@ -0,0 +1,292 @@
+import csv
+import datetime
+import hashlib
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from utils.parser import UNKNOWN_DAY
+
+# Columns of a matches table, one row per exam
+MATCH_COLUMNS = ["course_name", "section", "room", "date", "day_of_week", "start", "end",
+                 "available_count", "available_doctors"]
+# An /assign result adds who was picked
+ASSIGNMENT_COLUMNS = MATCH_COLUMNS + ["required", "proctors", "unfilled"]
+
+# Format -> (mimetype, file extension) of the streamed exports
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "ics": ("text/calendar; charset=utf-8", "ics"),
+}
+
+# Exports are handed out in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+
+def match_rows(matches, separator="; "):
+    """
+    Flat rows (lists, in MATCH_COLUMNS order) for the matches of check_availability,
+    the available doctors joined into one cell.
+    """
+    for exam in matches:
+        doctors = available_doctors(exam)
+        yield [
+            exam.get("course_name", ""),
+            exam.get("section", ""),
+            exam.get("room", ""),
+            exam.get("date", ""),
+            exam.get("day_of_week") or "",
+            exam.get("start", ""),
+            exam.get("end", ""),
+            len(doctors),
+            separator.join(doctors),
+        ]
+
+
+def available_doctors(exam):
+    """
+    The exam's available doctors, without the UNKNOWN_DAY marker of an exam whose
+    weekday couldn't be told (it has none).
+    """
+    return [name for name in exam.get("available_doctors") or [] if name != UNKNOWN_DAY]
+
+
+def assignment_rows(assignments, separator="; "):
+    """
+    Like match_rows for the "assignments" of assign_proctors, in ASSIGNMENT_COLUMNS order.
+    """
+    for exam in assignments:
+        row = next(match_rows([exam], separator))
+        yield row + [exam.get("required", 0), separator.join(exam.get("proctors") or []), exam.get("unfilled", 0)]
+
+
+def write_matches_csv(f, matches):
+    """
+    Writes the matches as CSV to the text file f (open it with newline="").
+    """
+    writer = csv.writer(f)
+    writer.writerow(MATCH_COLUMNS)
+    writer.writerows(match_rows(matches))
+
+
+def iter_export(fmt, exams, assignments=False):
+    """
+    Streams matches (or, with assignments=True, /assign assignments) as an export
+    file in one of EXPORT_FORMATS. exams can be any iterable, it is read one exam at a
+    time and the file comes out in chunks, so nothing holds the whole file in memory.
+    """
+    if fmt == "ics":
+        return iter_ics(exams)
+    columns, rows = (ASSIGNMENT_COLUMNS, assignment_rows(exams)) if assignments else (MATCH_COLUMNS, match_rows(exams))
+    if fmt == "csv":
+        return iter_csv(columns, rows)
+    if fmt == "xlsx":
+        return iter_xlsx(columns, rows, sheet="Assignments" if assignments else "Matches")
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def iter_csv(columns, rows):
+    """
+    CSV text in chunks, with a BOM first so Excel shows the Arabic names.
+    """
+    buffer = io.StringIO()
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# --- XLSX ---
+# A minimal workbook (one sheet, inline strings, no styles) written straight into a
+# zip stream, so no spreadsheet library is needed and rows never pile up in memory.
+
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+_WORKBOOK = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_SHEET_HEAD = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+# Control characters aren't allowed in XML 1.0, even escaped
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+class _ZipSink:
+    """
+    Write-only file for zipfile that collects the compressed bytes until the generator
+    hands them out. It has no tell()/seek(), so zipfile streams (data descriptors).
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_xlsx(columns, rows, sheet="Sheet1"):
+    """
+    An .xlsx workbook with one sheet (header row + rows), as bytes chunks.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, _XML_HEAD + xml)
+        zf.writestr("xl/workbook.xml", _XML_HEAD + _WORKBOOK.format(name=escape(sheet, {'"': "&quot;"})))
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as f:
+            f.write((_XML_HEAD + _SHEET_HEAD + _xlsx_row(columns)).encode("utf-8"))
+            for row in rows:
+                f.write(_xlsx_row(row).encode("utf-8"))
+                if sink.size >= CHUNK_BYTES:
+                    yield sink.drain()
+            f.write(_SHEET_TAIL.encode("utf-8"))
+    yield sink.drain()
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(_XML_INVALID_RE.sub("", str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+# --- iCalendar ---
+
+ICS_PRODID = "-//aau-schedule-maker//Exam schedule//EN"
+
+
+def iter_ics(exams):
+    """
+    An iCalendar file with one event per exam, as text chunks. Times are floating
+    (local) time, like the timetable. Exams without a DD/MM/YYYY date or valid times
+    can't be placed on a calendar and are left out. Assignments list their proctors
+    in the description, matches the available doctors.
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{ICS_PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    size = 0
+    for exam in exams:
+        event = _ics_event(exam, stamp)
+        if event is None:
+            continue
+        lines.extend(event)
+        size += sum(len(line) for line in event)
+        if size >= CHUNK_BYTES:
+            yield "".join(_ics_fold(line) for line in lines)
+            lines.clear()
+            size = 0
+    lines.append("END:VCALENDAR")
+    yield "".join(_ics_fold(line) for line in lines)
+
+
+def _ics_event(exam, stamp):
+    try:
+        day = datetime.datetime.strptime(exam.get("date") or "", "%d/%m/%Y").date()
+        start = _ics_time(day, exam.get("start"))
+        end = _ics_time(day, exam.get("end"))
+    except (TypeError, ValueError):
+        return None
+
+    course = exam.get("course_name", "")
+    section = exam.get("section", "")
+    room = exam.get("room", "")
+    uid_source = "|".join(str(v) for v in (course, section, room, exam.get("date"), exam.get("start")))
+    summary = f"{course} ({section})" if section else course
+
+    if "proctors" in exam:
+        description = "Proctors: " + ", ".join(exam.get("proctors") or [])
+    else:
+        description = "Available: " + ", ".join(available_doctors(exam))
+
+    event = [
+        "BEGIN:VEVENT",
+        f"UID:{hashlib.sha1(uid_source.encode('utf-8')).hexdigest()}@aau-schedule-maker",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{start}",
+        f"DTEND:{end}",
+        f"SUMMARY:{_ics_text(summary)}",
+    ]
+    if room:
+        event.append(f"LOCATION:{_ics_text(room)}")
+    event.append(f"DESCRIPTION:{_ics_text(description)}")
+    event.append("END:VEVENT")
+    return event
+
+
+def _ics_time(day, hhmm):
+    h, m = map(int, hhmm.split(":"))
+    return datetime.datetime.combine(day, datetime.time(h, m)).strftime("%Y%m%dT%H%M%S")
+
+
+def _ics_text(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line):
+    # Lines longer than 75 octets are folded (RFC 5545), without splitting a UTF-8 character
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
@@ -0,0 +1,47 @@
+from utils.model import DoctorsDB, Weekday, merge_intervals, free_gaps, min_to_time
+
+
+class FreeTimeTable:
+    """
+    Merged busy intervals and free gaps of every doctor on every weekday, computed in
+    one pass over the doctors DB and kept ready to serve (times as "HH:MM").
+
+    Unlike calculate_free_time, a day without any busy slot is free for the whole
+    window rather than left out, since the DB covers the doctor's full week.
+    """
+
+    def __init__(self, doctors_db, day_start=8 * 60, day_end=16 * 60, min_gap=15):
+        db = DoctorsDB.coerce(doctors_db)
+        self.day_start = day_start
+        self.day_end = day_end
+        self.min_gap = min_gap
+
+        self.busy = {}
+        self.free = {}
+        for doctor in db:
+            busy_days, free_days = {}, {}
+            for day in Weekday:
+                merged = merge_intervals(doctor.slots(day))
+                busy_days[day.key] = [(min_to_time(s), min_to_time(e)) for s, e in merged]
+                free_days[day.key] = [(min_to_time(s), min_to_time(e))
+                                      for s, e in free_gaps(merged, day_start, day_end, min_gap)]
+            self.busy[doctor.name] = busy_days
+            self.free[doctor.name] = free_days
+
+    def __contains__(self, name):
+        return name in self.free
+
+    def doctor(self, name, day=None):
+        """
+        {day: [(start, end), ...]} free gaps of one doctor (only `day` if given), None if unknown.
+        """
+        free = self.free.get(name)
+        if free is None:
+            return None
+        return {day: free[day]} if day else free
+
+    def day(self, day):
+        """
+        {doctor: [(start, end), ...]} free gaps of every doctor on one weekday ('Sun'..'Thu').
+        """
+        return {name: free[day] for name, free in self.free.items()}
@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Job ids are uuid4 hex, anything else never touches the filesystem
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Result lists that are also written one item per line, so they can be read back
+# (e.g. exported) without loading the whole result
+ITEM_KEYS = ("matches",)
+
+# A running job rewrites its state at least this often; one that hasn't for
+# STALE_SECONDS lost its worker (killed by a timeout, a restart...)
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 6 * HEARTBEAT_SECONDS
+
+
+class JobManager:
+    """
+    Runs long parse jobs in a background thread or process pool.
+
+    Job state (status, progress, result) lives in small JSON files under `directory`,
+    so any gunicorn worker can answer a status poll, and process-pool jobs report
+    progress without any shared memory. The state also names the process that owns
+    the job and when it last showed signs of life, so a job whose worker died is
+    reported as failed instead of "running" forever.
+    """
+
+    def __init__(self, directory, executor="thread", max_workers=2, ttl=24 * 3600):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown job executor: {executor}")
+
+        self.directory = directory
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._executor = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, fn, *args):
+        """
+        Queues fn(*args, progress=...) and returns the new job id straight away.
+        fn must be a module-level function when using the process executor.
+        """
+        self._cleanup()
+
+        job_id = uuid.uuid4().hex
+        _write_state(self.directory, job_id, status="queued", progress={}, created=time.time(), **_owner())
+        self._get_executor().submit(_run_job, self.directory, job_id, fn, args)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Status dict for a job (None if unknown). Includes "result" once the job is done.
+        """
+        if not JOB_ID_RE.match(job_id):
+            return None
+
+        state = _read_json(_state_path(self.directory, job_id))
+        if state is None:
+            return None
+
+        if state["status"] == "done":
+            state["result"] = _read_json(_result_path(self.directory, job_id))
+        elif state["status"] in ("queued", "running"):
+            reason = _abandoned(state)
+            if reason:
+                state.update(status="error", error=f"Job abandoned: {reason}", abandoned=True)
+        return state
+
+    def iter_items(self, job_id, key):
+        """
+        Iterator over result[key] (one of ITEM_KEYS) of a finished job, read one item at
+        a time. None if the job is unknown, not done, or its result has no such list.
+        """
+        if not JOB_ID_RE.match(job_id) or key not in ITEM_KEYS:
+            return None
+
+        state = _read_json(_state_path(self.directory, job_id))
+        path = _items_path(self.directory, job_id, key)
+        if state is None or state["status"] != "done" or not os.path.exists(path):
+            return None
+        return _iter_jsonl(path)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                pool = ThreadPoolExecutor if self.executor_kind == "thread" else ProcessPoolExecutor
+                self._executor = pool(max_workers=self.max_workers)
+            return self._executor
+
+    def _cleanup(self):
+        # Drop job files older than the TTL
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+class JobProgress:
+    """
+    Progress callback handed to the parsers: progress(stage, done, total).
+    Writes are throttled so a per-exam callback doesn't mean per-exam disk I/O.
+    """
+
+    STAGE_KEYS = {
+        "pages": ("pages_parsed", "pages_total"),
+        "exams": ("exams_matched", "exams_total"),
+    }
+
+    def __init__(self, directory, job_id, interval=0.5):
+        self.directory = directory
+        self.job_id = job_id
+        self.interval = interval
+        self.progress = {}
+        self._last_write = 0.0
+        self._lock = threading.Lock()  # progress and heartbeat write the same file
+
+    def __call__(self, stage, done, total):
+        done_key, total_key = self.STAGE_KEYS.get(stage, (f"{stage}_done", f"{stage}_total"))
+        with self._lock:
+            self.progress.update({"stage": stage, done_key: done, total_key: total})
+
+            now = time.monotonic()
+            if (total is not None and done >= total) or now - self._last_write >= self.interval:
+                self._last_write = now
+                _update_state(self.directory, self.job_id, progress=self.progress, heartbeat=time.time())
+
+    def beat(self, stop):
+        # Heartbeat thread: keeps the state fresh while a step reports no progress
+        while not stop.wait(HEARTBEAT_SECONDS):
+            with self._lock:
+                _update_state(self.directory, self.job_id, heartbeat=time.time())
+
+
+def _run_job(directory, job_id, fn, args):
+    progress = JobProgress(directory, job_id)
+    now = time.time()
+    _update_state(directory, job_id, status="running", started=now, heartbeat=now, **_owner())
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=progress.beat, args=(stop,), daemon=True)
+    heartbeat.start()
+    try:
+        result = fn(*args, progress=progress)
+        # Saving the result can fail too (disk full, something JSON can't hold)
+        _write_json(_result_path(directory, job_id), result)
+        if isinstance(result, dict):
+            for key in ITEM_KEYS:
+                if isinstance(result.get(key), list):
+                    _write_jsonl(_items_path(directory, job_id, key), result[key])
+    except Exception as e:
+        error = str(e)
+    else:
+        error = None
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if error is not None:
+        _update_state(directory, job_id, status="error", error=error, progress=progress.progress, finished=time.time())
+        return
+    _update_state(directory, job_id, status="done", progress=progress.progress, finished=time.time())
+
+
+def _owner():
+    # Who runs (or queued) a job, for telling a dead one from a slow one
+    return {"pid": os.getpid(), "host": socket.gethostname()}
+
+
+def _abandoned(state):
+    """
+    Why a queued / running job can't finish any more (its process is gone, or a
+    running job stopped beating), None if it still may.
+    """
+    pid = state.get("pid")
+    if pid and state.get("host") == socket.gethostname():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return f"its worker process ({pid}) has exited"
+        except OSError:
+            pass  # Exists, just not ours to signal
+    heartbeat = state.get("heartbeat")
+    if state["status"] == "running" and heartbeat and time.time() - heartbeat > STALE_SECONDS:
+        return f"no heartbeat for {int(time.time() - heartbeat)} seconds"
+    return None
+
+
+def _state_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.json")
+
+
+def _result_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.result.json")
+
+
+def _items_path(directory, job_id, key):
+    return os.path.join(directory, f"{job_id}.{key}.jsonl")
+
+
+def _write_state(directory, job_id, **state):
+    state["id"] = job_id
+    _write_json(_state_path(directory, job_id), state)
+
+
+def _update_state(directory, job_id, **changes):
+    state = _read_json(_state_path(directory, job_id)) or {"id": job_id}
+    state.update(changes)
+    _write_json(_state_path(directory, job_id), state)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    # Write then rename, pollers in other workers must never see half a file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+
+def _write_jsonl(path, items):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False))
+                f.write("\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _iter_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,329 @@
+"""
+The doctors schedule as a compact binary file that every gunicorn worker maps
+read-only: one physical copy in the page cache instead of a Python-object copy (and
+a BusyIndex) per worker, and a worker picks up a new schedule by mapping the new
+file, with no parsing or JSON decoding.
+
+publish() writes doctors-<store id>-v<version>.bin plus manifest.json (the store id,
+current version and file) into a directory; open_index() maps it again. The store id
+ties the directory to one database: versions only compare within a store, so a
+manifest or file left by another (e.g. deleted and recreated) database is never
+mapped and doesn't block publishing. MappedIndex answers the same
+queries as BusyIndex (busy_mask, free_doctors, is_free) straight from the mapped
+buffers, so check_availability can run on it directly.
+
+File layout (native little-endian, every section 8-byte aligned):
+
+    header         magic, format, doctors, weekdays, mask bytes
+    section table  (offset, length) of each section below
+    name_offsets   u32[doctors + 1]         into name_bytes
+    name_bytes     UTF-8 doctor names, in DB order
+    slot_index     u32[doctors * 5 + 1]     busy slots of doctor d on weekday w are
+    slots          u16[2 * slots]           pairs slot_index[d*5+w] .. slot_index[d*5+w+1]
+    segment_index  u32[5 + 1]               segments of weekday w, like BusyIndex:
+    bounds         u16[segments]            segment start minute
+    masks          bytes[segments * mask]   bitset of the doctors busy in the segment
+    odd_index      u32[5 + 1]               zero-length slots of weekday w:
+    odd            u32[3 * odd]             (start, end, doctor)
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
+
+from utils.model import Doctor, DoctorsDB, Weekday, WEEKDAY_KEYS
+
+MAGIC = b"AAUIDX\x00\x00"
+FORMAT = 1
+MANIFEST = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+_DAYS = len(WEEKDAY_KEYS)
+_HEADER = struct.Struct("<8sIIII")  # magic, format, doctors, weekdays, mask bytes
+_SECTIONS = (
+    ("name_offsets", "I"), ("name_bytes", "B"), ("slot_index", "I"), ("slots", "H"),
+    ("segment_index", "I"), ("bounds", "H"), ("masks", "B"), ("odd_index", "I"), ("odd", "I"),
+)
+_SECTION_TABLE = struct.Struct("<" + "QQ" * len(_SECTIONS))
+# Published index files (not the temp files they are written to): store id, version
+_FILE_RE = re.compile(r"doctors-(?:([0-9A-Za-z]+)-)?v(\d+)\.bin$")
+
+
+def supported():
+    # The sections are read with memoryview.cast, i.e. in native byte order
+    return sys.byteorder == "little"
+
+
+def publish(directory, version, doctors_db, store_id=None):
+    """
+    Writes the index of doctors_db as `version` of store `store_id` and points the
+    manifest at it, both atomically, then removes the files of older versions and of
+    other stores (workers that still map one keep their mapping). Returns the path
+    of the new file.
+
+    Workers may publish at the same time, and a slower one may finish last with an
+    older version: the manifest only ever moves forward (checked under a lock file),
+    and only files of versions below `version` are removed, never newer ones or
+    another writer's temp file. A manifest of another store is always replaced.
+    """
+    from utils.availability import BusyIndex
+
+    db = DoctorsDB.coerce(doctors_db)
+    os.makedirs(directory, exist_ok=True)
+    name = f"doctors-{store_id}-v{version}.bin" if store_id else f"doctors-v{version}.bin"
+    path = os.path.join(directory, name)
+
+    sections = _build_sections(db, BusyIndex(db))
+    mask_bytes = _mask_bytes(len(db))
+    _write_atomic(path, _encode(sections, len(db), mask_bytes))
+
+    manifest = {
+        "format": FORMAT,
+        "store_id": store_id,
+        "version": version,
+        "file": name,
+        "doctors": len(db),
+        "slots": len(sections["slots"]) // 2,
+        "bytes": os.path.getsize(path),
+        "created": time.time(),
+    }
+    with _locked(directory):
+        current = _read_manifest(directory)
+        if (current is None or current.get("format") != FORMAT or current.get("store_id") != store_id
+                or current.get("version", -1) < version):
+            _write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest).encode("utf-8"))
+
+    for entry in os.scandir(directory):
+        match = _FILE_RE.match(entry.name)
+        if match and (match.group(1) != store_id or int(match.group(2)) < version):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+    return path
+
+
+def open_index(directory, version=None, store_id=None):
+    """
+    MappedIndex of the manifest's file, or None if there is none, it belongs to
+    another store than `store_id`, it isn't `version` (when given), or it can't be
+    used here.
+    """
+    if not supported():
+        return None
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        return None
+    if manifest.get("format") != FORMAT or manifest.get("store_id") != store_id:
+        return None
+    if version is not None and manifest.get("version") != version:
+        return None
+    try:
+        return MappedIndex(os.path.join(directory, manifest["file"]), manifest["version"])
+    except (OSError, ValueError):
+        # Replaced by a newer version between reading the manifest and opening it
+        return None
+
+
+class MappedIndex:
+    """
+    Read-only view of a published index file, see the module docstring. Nothing is
+    copied out of the mapping except the names (decoded once, on first use) and the
+    few segment bitsets a query ORs together.
+    """
+
+    def __init__(self, path, version=None):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+
+        magic, fmt, doctors, days, mask_bytes = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or fmt != FORMAT or days != _DAYS:
+            raise ValueError(f"Not a doctors index file: {path}")
+        table = _SECTION_TABLE.unpack_from(buf, _HEADER.size)
+        for k, (name, typecode) in enumerate(_SECTIONS):
+            offset, length = table[2 * k], table[2 * k + 1]
+            view = buf[offset:offset + length]
+            setattr(self, "_" + name, view if typecode == "B" else view.cast(typecode))
+
+        self.path = path
+        self.version = version
+        self.doctors = doctors
+        self._mask = mask_bytes
+        self._names = None
+        self._positions = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            offsets = self._name_offsets
+            self._names = [sys.intern(str(self._name_bytes[offsets[i]:offsets[i + 1]], "utf-8"))
+                           for i in range(self.doctors)]
+        return self._names
+
+    def __len__(self):
+        return self.doctors
+
+    def busy_mask(self, day, start_min, end_min):
+        """
+        Bitmask (by doctor position) of the doctors busy at some point in [start, end) on day.
+        """
+        w = Weekday.parse(day)
+        if w is None:
+            return 0
+
+        if start_min >= end_min:
+            # Zero-length exam, not covered by the segments. Check slots directly.
+            return self._busy_direct(w, start_min, end_min)
+
+        busy = 0
+        odd = self._odd
+        for k in range(self._odd_index[w], self._odd_index[w + 1]):
+            s, e, d = odd[3 * k], odd[3 * k + 1], odd[3 * k + 2]
+            if start_min < e and end_min > s:
+                busy |= 1 << d
+
+        lo, hi = self._segment_index[w], self._segment_index[w + 1]
+        bounds, masks, size = self._bounds, self._masks, self._mask
+        k = max(bisect_right(bounds, start_min, lo, hi) - 1, lo)
+        while k < hi and bounds[k] < end_min:
+            busy |= int.from_bytes(masks[k * size:(k + 1) * size], "little")
+            k += 1
+        return busy
+
+    def _busy_direct(self, w, start_min, end_min):
+        busy = 0
+        index, slots = self._slot_index, self._slots
+        for d in range(self.doctors):
+            for k in range(index[d * _DAYS + w], index[d * _DAYS + w + 1]):
+                if start_min < slots[2 * k + 1] and end_min > slots[2 * k]:
+                    busy |= 1 << d
+                    break
+        return busy
+
+    def free_doctors(self, day, start_min, end_min):
+        """
+        Names of the doctors with no busy slot overlapping [start, end) on day, in DB order.
+        """
+        busy = self.busy_mask(day, start_min, end_min)
+        if not busy:
+            return list(self.names)
+
+        bits = format(busy, f"0{self.doctors}b")[::-1]
+        return [name for name, b in zip(self.names, bits) if b == "0"]
+
+    def is_free(self, name, day, start_min, end_min):
+        """
+        True if the doctor has no busy slot overlapping [start, end) on day.
+        """
+        if self._positions is None:
+            self._positions = {n: idx for idx, n in enumerate(self.names)}
+        return not (self.busy_mask(day, start_min, end_min) >> self._positions[name]) & 1
+
+    def to_db(self):
+        """
+        The schedule back as a DoctorsDB (a copy), for the engines that need one.
+        """
+        db = DoctorsDB()
+        index, slots = self._slot_index, self._slots
+        for d, name in enumerate(self.names):
+            doctor = Doctor(name)
+            for w in range(_DAYS):
+                lo, hi = index[d * _DAYS + w], index[d * _DAYS + w + 1]
+                doctor.busy[w].extend(slots[2 * lo:2 * hi])
+            db.doctors[doctor.name] = doctor
+        return db
+
+
+def _build_sections(db, busy_index):
+    name_offsets, name_bytes = array("I", [0]), bytearray()
+    slot_index, slots = array("I", [0]), array("H")
+    for doctor in db:
+        name_bytes += doctor.name.encode("utf-8")
+        name_offsets.append(len(name_bytes))
+        for arr in doctor.busy:
+            slots.extend(arr)
+            slot_index.append(len(slots) // 2)
+
+    mask_bytes = _mask_bytes(len(db))
+    segment_index, bounds, masks = array("I", [0]), array("H"), bytearray()
+    odd_index, odd = array("I", [0]), array("I")
+    for day in WEEKDAY_KEYS:
+        _, day_bounds, day_masks, day_odd = busy_index._days[day]
+        bounds.extend(day_bounds)
+        for mask in day_masks:
+            masks += mask.to_bytes(mask_bytes, "little")
+        segment_index.append(len(bounds))
+        for s, e, bit in day_odd:
+            odd.extend((s, e, bit.bit_length() - 1))
+        odd_index.append(len(odd) // 3)
+
+    return {
+        "name_offsets": name_offsets, "name_bytes": name_bytes, "slot_index": slot_index, "slots": slots,
+        "segment_index": segment_index, "bounds": bounds, "masks": masks,
+        "odd_index": odd_index, "odd": odd,
+    }
+
+
+def _mask_bytes(doctors):
+    return max((doctors + 7) // 8, 1)
+
+
+def _encode(sections, doctors, mask_bytes):
+    offset = _align(_HEADER.size + _SECTION_TABLE.size)
+    table, blobs = [], []
+    for name, _ in _SECTIONS:
+        blob = bytes(sections[name])
+        table += [offset, len(blob)]
+        blobs.append((offset, blob))
+        offset = _align(offset + len(blob))
+
+    out = bytearray(offset)
+    _HEADER.pack_into(out, 0, MAGIC, FORMAT, doctors, _DAYS, mask_bytes)
+    _SECTION_TABLE.pack_into(out, _HEADER.size, *table)
+    for start, blob in blobs:
+        out[start:start + len(blob)] = blob
+    return out
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _locked(directory):
+    # Exclusive lock on the directory's lock file, across processes (POSIX only;
+    # elsewhere there's a single process serving anyway, so it's skipped)
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_atomic(path, data):
+    # Write then rename: a worker mapping the file never sees half of it
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
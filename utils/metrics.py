@@ -0,0 +1,184 @@
+"""
+Per-stage timings and counters for the parse / match hot paths.
+
+Code under measurement wraps a stage in `with metrics.stage("pdf_open"):` and bumps
+counters with `metrics.count("pages")`. Every sample goes into the process-wide
+REGISTRY (rendered in the Prometheus text format by render()) and, while a request is
+being traced (start_trace()), into that request's Trace as well.
+
+Each process keeps its own numbers: stages run in a process pool (parallel PDF pages,
+process-executor jobs) only show up in that worker's registry.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from time import perf_counter
+
+PREFIX = "schedule"
+
+# Histogram bucket bounds (seconds), from a cached time slot to a whole-season parse
+BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("metrics_trace", default=None)
+
+
+class Registry:
+    """
+    Thread-safe counters and histograms keyed by (metric name, labels).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.counters = {}    # (name, labels) -> value
+
+    def observe(self, name, seconds, **labels):
+        self.observe_key((name, tuple(sorted(labels.items()))), seconds)
+
+    def observe_key(self, key, seconds):
+        # observe() with a prebuilt (name, labels) key, for the hot paths
+        idx = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            hist[idx] += 1
+            hist[-1] += seconds
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self, gauges=None):
+        """
+        Prometheus text exposition of everything recorded, plus `gauges`
+        ({name: value}, e.g. cache stats read at scrape time).
+        """
+        with self._lock:
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {PREFIX}_{name} histogram")
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float("inf"),), hist[:-1]):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{PREFIX}_{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{PREFIX}_{name}_sum{_labels(labels)} {hist[-1]}")
+                lines.append(f"{PREFIX}_{name}_count{_labels(labels)} {cumulative}")
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+
+
+class Trace:
+    """
+    Stage timings and counts recorded while handling one request.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> [calls, seconds]
+        self.counts = {}
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {stage: {"calls": calls, "seconds": round(seconds, 6)}
+                       for stage, (calls, seconds) in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+
+def start_trace(name):
+    """
+    Starts recording into a new Trace for the current context (thread / request).
+    """
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def end_trace():
+    _current.set(None)
+
+
+class stage:
+    """
+    Context manager timing one run of a stage: `with stage("page_table"): ...`
+    """
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, perf_counter() - self.started)
+
+
+_stage_keys = {}
+
+
+def record(name, seconds):
+    """
+    Records one run of a stage that was timed by hand.
+    """
+    key = _stage_keys.get(name)
+    if key is None:
+        key = _stage_keys[name] = ("stage_seconds", (("stage", name),))
+    REGISTRY.observe_key(key, seconds)
+    trace = _current.get()
+    if trace is not None:
+        entry = trace.stages.get(name)
+        if entry is None:
+            trace.stages[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+def count(name, n=1):
+    """
+    Adds n to an event counter (pages, rows, exams, cache hits...).
+    """
+    REGISTRY.inc("events_total", n, event=name)
+    trace = _current.get()
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0) + n
@@ -0,0 +1,223 @@
+import sys
+from array import array
+from enum import IntEnum
+
+from utils.parser import time_to_min
+
+
+class Weekday(IntEnum):
+    """
+    Teaching days, in the order used everywhere else ('Sun' .. 'Thu').
+    """
+    SUN = 0
+    MON = 1
+    TUE = 2
+    WED = 3
+    THU = 4
+
+    @property
+    def key(self):
+        return WEEKDAY_KEYS[self]
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Weekday for a key like 'Sun' (or a Weekday), None for anything else (e.g. 'Fri').
+        """
+        if isinstance(value, Weekday):
+            return value
+        idx = _WEEKDAY_INDEX.get(value)
+        return None if idx is None else cls(idx)
+
+
+WEEKDAY_KEYS = ('Sun', 'Mon', 'Tue', 'Wed', 'Thu')
+_WEEKDAY_INDEX = {key: i for i, key in enumerate(WEEKDAY_KEYS)}
+
+
+def min_to_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class Doctor:
+    """
+    One lecturer: an interned name and, per weekday, a flat array of busy minutes
+    [start0, end0, start1, end1, ...] instead of lists of "HH:MM" tuples.
+    """
+    __slots__ = ('name', 'busy')
+
+    def __init__(self, name):
+        self.name = sys.intern(name)
+        self.busy = tuple(array('H') for _ in WEEKDAY_KEYS)
+
+    def add_slot(self, day, start, end):
+        self.busy[day].extend((start, end))
+
+    def slots(self, day):
+        """
+        Busy (start, end) minutes on a day ('Sun' or Weekday.SUN), in parse order.
+        """
+        day = Weekday.parse(day)
+        if day is None:
+            return []
+        arr = self.busy[day]
+        return list(zip(arr[::2], arr[1::2]))
+
+    def free_time(self, day_start=8 * 60, day_end=16 * 60, min_gap=15):
+        """
+        Free gaps per weekday inside the working window, as (start, end) minutes.
+        Days with no busy slots are left out, like calculate_free_time.
+        """
+        free = {}
+        for day in Weekday:
+            slots = self.slots(day)
+            if not slots:
+                continue
+            gaps = free_gaps(merge_intervals(slots), day_start, day_end, min_gap)
+            if gaps:
+                free[day] = gaps
+        return free
+
+    def to_dict(self):
+        return {"busy_slots": {
+            day.key: [(min_to_time(s), min_to_time(e)) for s, e in self.slots(day)]
+            for day in Weekday
+        }}
+
+
+class DoctorsDB:
+    """
+    Parsed doctors schedule keyed by name, in parse order.
+    to_dict() gives back the parse_doctors_pdf / JSON shape.
+    """
+    __slots__ = ('doctors',)
+
+    def __init__(self, doctors=()):
+        self.doctors = {doctor.name: doctor for doctor in doctors}
+
+    @classmethod
+    def from_dict(cls, doctors_db):
+        """
+        Builds the model from parse_doctors_pdf output, converting every "HH:MM" once.
+        """
+        minutes = {}
+        db = cls()
+        for name, doc_data in doctors_db.items():
+            doctor = Doctor(name)
+            for day_key, slots in doc_data["busy_slots"].items():
+                day = Weekday.parse(day_key)
+                if day is None:
+                    continue
+                for b_start, b_end in slots:
+                    s = minutes.get(b_start)
+                    if s is None:
+                        s = minutes[b_start] = time_to_min(b_start)
+                    e = minutes.get(b_end)
+                    if e is None:
+                        e = minutes[b_end] = time_to_min(b_end)
+                    doctor.add_slot(day, s, e)
+            db.doctors[doctor.name] = doctor
+        return db
+
+    @classmethod
+    def coerce(cls, doctors_db):
+        if isinstance(doctors_db, cls):
+            return doctors_db
+        if hasattr(doctors_db, "to_db"):
+            # e.g. a MappedIndex
+            return doctors_db.to_db()
+        return cls.from_dict(doctors_db)
+
+    @property
+    def names(self):
+        return list(self.doctors)
+
+    def __iter__(self):
+        return iter(self.doctors.values())
+
+    def __len__(self):
+        return len(self.doctors)
+
+    def __contains__(self, name):
+        return name in self.doctors
+
+    def get(self, name):
+        return self.doctors.get(name)
+
+    def to_dict(self):
+        return {name: doctor.to_dict() for name, doctor in self.doctors.items()}
+
+
+class Exam:
+    """
+    One exam slot from parse_exams_docx, with integer minutes and interned text fields.
+    """
+    __slots__ = ('course_name', 'raw_time', 'start', 'end', 'date', 'day', 'room', 'section')
+
+    def __init__(self, course_name, raw_time, start, end, date="", day=None, room="", section=""):
+        self.course_name = sys.intern(course_name)
+        self.raw_time = sys.intern(raw_time)
+        self.start = start
+        self.end = end
+        self.date = sys.intern(date)
+        self.day = day
+        self.room = sys.intern(room)
+        self.section = sys.intern(section)
+
+    @classmethod
+    def from_dict(cls, exam):
+        return cls(
+            exam["course_name"], exam["raw_time"],
+            time_to_min(exam["start"]), time_to_min(exam["end"]),
+            exam.get("date", ""), Weekday.parse(exam.get("day_of_week")),
+            exam.get("room", ""), exam.get("section", ""),
+        )
+
+    def to_dict(self):
+        return {
+            "course_name": self.course_name,
+            "raw_time": self.raw_time,
+            "start": min_to_time(self.start),
+            "end": min_to_time(self.end),
+            "date": self.date,
+            "day_of_week": self.day.key if self.day is not None else None,
+            "room": self.room,
+            "section": self.section
+        }
+
+
+def merge_intervals(intervals):
+    """
+    Sorts (start, end) minute pairs and merges the overlapping ones.
+    """
+    intervals = sorted(intervals)
+    if not intervals:
+        return []
+
+    merged = []
+    curr_start, curr_end = intervals[0]
+    for next_start, next_end in intervals[1:]:
+        if next_start < curr_end:
+            curr_end = max(curr_end, next_end)
+        else:
+            merged.append((curr_start, curr_end))
+            curr_start, curr_end = next_start, next_end
+    merged.append((curr_start, curr_end))
+    return merged
+
+
+def free_gaps(merged, day_start, day_end, min_gap=15):
+    """
+    Gaps of at least min_gap minutes between merged busy intervals, inside [day_start, day_end].
+    """
+    gaps = []
+    last_end = day_start
+
+    for start, end in merged:
+        if start > last_end:
+            gaps.append((last_end, start))
+        last_end = max(last_end, end)
+
+    if last_end < day_end:
+        gaps.append((last_end, day_end))
+
+    return [(s, e) for s, e in gaps if e - s >= min_gap]
@@ -1,285 +1,718 @@
+import io
+import os
+import hashlib
 import re
-import docx
-import pdfplumber
+import time
 import datetime
 import unicodedata
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from utils import metrics
+from utils.docx_tables import iter_table_rows, READ_ERRORS as DOCX_READ_ERRORS
+
+# pdfplumber (and pdfminer) are imported inside the PDF functions: they're the bulk of
+# this module's import time and most callers (matching, the DOCX side) never need them
+
+# Bump whenever parse output changes, so cached results are not reused
+PARSER_VERSION = 4
+
+# Below this many pages the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 40
+
+# SCHEDULE_DEBUG=1 prints how the first exam was matched (off by default, it's per-exam I/O)
+DEBUG_MATCHING = os.environ.get('SCHEDULE_DEBUG') == '1'
+
+# What check_availability lists as an exam's available doctors when it couldn't tell
+# the weekday; not a doctor, so anything counting or listing doctors must skip it
+UNKNOWN_DAY = "Unknown Date/Day"
+
+def _open_source(source):
+    """
+    Something pdfplumber / zipfile can open: a path stays a path, bytes become a
+    BytesIO, and file-like objects are rewound and passed through.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+# Keywords to identify the exam table's columns
+EXAM_HEADER_KEYWORDS = {
+    "course_name": ["اسم المقرر", "المادة", "المساق"],
+    "course_code": ["رمز المقرر", "رقم المادة"],
+    "time": ["الوقت", "الزمن", "ساعة الامتحان"],
+    "room": ["القاعة", "المكان", "القاعة/ المختبر"],
+    "days": ["الأيام", "اليوم", "موعد الامتحان"],
+    "section": ["الشعبة", "رقم الشعبة"]
+}
 
 def parse_exams_docx(file_path):
     """
     Parses the Exam Schedule (Word). Returns a list of exams.
+    file_path may also be the file's bytes or a binary file-like object.
     """
-    results = []
-    
+    with metrics.stage("docx_parse"):
+        return list(iter_exams_docx(file_path))
+
+def iter_exams_docx(file_path):
+    """
+    Generator version of parse_exams_docx. Tables are read row by row from the
+    document XML and each exam is yielded as soon as its row is read, so no table
+    is held in memory and the exams can go straight into iter_availability.
+    """
+    rows = 0
+    slot_seconds = 0.0  # Tallied here and recorded once, a stage per row costs too much
     try:
-        doc = Document(file_path)
-    except Exception as e:
-        print(f"Error opening Word file: {e}")
-        return results
+        table_idx = None
+        col_map = None
 
-    # Keywords to identify columns
-    header_keywords = {
-        "course_name": ["اسم المقرر", "المادة", "المساق"],
-        "course_code": ["رمز المقرر", "رقم المادة"],
-        "time": ["الوقت", "الزمن", "ساعة الامتحان"],
-        "room": ["القاعة", "المكان", "القاعة/ المختبر"],
-        "days": ["الأيام", "اليوم", "موعد الامتحان"],
-        "section": ["الشعبة", "رقم الشعبة"]
-    }
+        for row_table, row in iter_table_rows(_open_source(file_path)):
+            if row_table != table_idx:
+                # New table, look for its header row again
+                table_idx, col_map = row_table, None
 
-    for table_idx, table in enumerate(doc.tables):
-        # Convert table to list of lists
-        table_data = []
-        for row in table.rows:
-            row_data = [cell.text.strip() for cell in row.cells]
-            table_data.append(row_data)
-        
-        if not table_data:
-            continue
+            rows += 1
+            if col_map is None:
+                col_map = _match_exam_header(row)
+                continue
 
-        # Find Header Row
-        header_idx = -1
-        col_map = {}
-        
-        for i, row in enumerate(table_data):
-            temp_map = {}
-            for col_idx, cell_text in enumerate(row):
-                for key, keywords in header_keywords.items():
-                    if any(k in cell_text for k in keywords):
-                        temp_map[key] = col_idx
-                        break
-            
-            if "time" in temp_map and ("course_name" in temp_map or "days" in temp_map):
-                header_idx = i
-                col_map = temp_map
+            if not row or all(c == "" for c in row):
+                continue
+
+            try:
+                time_str = row[col_map["time"]] if "time" in col_map else ""
+                if not time_str or len(time_str) < 3: continue
+
+                course_name = row[col_map["course_name"]] if "course_name" in col_map else "Unknown Course"
+                days_str = row[col_map["days"]] if "days" in col_map else ""
+                room = row[col_map["room"]] if "room" in col_map else ""
+                section = row[col_map["section"]] if "section" in col_map else ""
+            except IndexError:
+                continue
+
+            t0 = time.perf_counter()
+            parsed = parse_time_slot(time_str, days_str_fallback=days_str, is_exam=True)
+            slot_seconds += time.perf_counter() - t0
+
+            for slot in parsed:
+                yield {
+                    "course_name": course_name,
+                    "raw_time": time_str,
+                    "start": slot["start"],
+                    "end": slot["end"],
+                    "date": slot.get("date", ""),
+                    "day_of_week": None,  # Let check_availability determine from date
+                    "room": room,
+                    "section": section
+                }
+    except DOCX_READ_ERRORS as e:
+        print(f"Error opening Word file: {e}")
+    finally:
+        metrics.count("docx_rows", rows)
+        metrics.record("time_slot", slot_seconds)
+
+def _match_exam_header(row):
+    """
+    Column map {key: index} if this row is the exam table's header row, else None.
+    """
+    temp_map = {}
+    for col_idx, cell_text in enumerate(row):
+        for key, keywords in EXAM_HEADER_KEYWORDS.items():
+            if any(k in cell_text for k in keywords):
+                temp_map[key] = col_idx
                 break
-        
-        if header_idx != -1:
-            for row_idx in range(header_idx + 1, len(table_data)):
-                row = table_data[row_idx]
-                if not row or all(c == "" for c in row):
-                    continue
-                
-                try:
-                    time_str = row[col_map["time"]] if "time" in col_map else ""
-                    if not time_str or len(time_str) < 3: continue
-                        
-                    course_name = row[col_map["course_name"]] if "course_name" in col_map else "Unknown Course"
-                    days_str = row[col_map["days"]] if "days" in col_map else ""
-                    room = row[col_map["room"]] if "room" in col_map else ""
-                    section = row[col_map["section"]] if "section" in col_map else ""
-                    
-                    parsed = parse_time_slot(time_str, days_str_fallback=days_str, is_exam=True)
-                    
-                    for slot in parsed:
-                        results.append({
-                            "course_name": course_name,
-                            "raw_time": time_str,
-                            "start": slot["start"],
-                            "end": slot["end"],
-                            "date": slot.get("date", ""),
-                            "day_of_week": None,  # Let check_availability determine from date
-                            "room": room,
-                            "section": section
-                        })
-                except IndexError:
-                    continue
-    return results
 
-def parse_doctors_pdf(pdf_path):
+    if "time" in temp_map and ("course_name" in temp_map or "days" in temp_map):
+        return temp_map
+    return None
+
+def parse_doctors_pdf(pdf_path, workers=1, min_pages=PARALLEL_MIN_PAGES, progress=None, single_pass=True):
     """
     Parses the Master Doctor Schedule (PDF). Returns { "Dr. Name": { "busy_slots": { "Mon": [(start, end)] } } }
+
+    With workers > 1 and at least min_pages pages, the page range is split across a
+    process pool. Each worker opens the PDF on its own and the partial results are
+    merged in page order, so the output is the same as the serial path.
+
+    With single_pass, each page's characters are read once and shared by the name
+    search and the table extraction, and the page's caches are released as soon as
+    it's parsed, so memory stays flat on long PDFs.
+
+    pdf_path may also be the file's bytes or a binary file-like object.
+    progress, if given, is called as progress("pages", parsed, total).
+    """
+    import pdfplumber
+
+    if workers and workers > 1:
+        with pdfplumber.open(_open_source(pdf_path)) as pdf:
+            page_count = len(pdf.pages)
+
+        if page_count >= min_pages:
+            # A few chunks per worker so one slow range doesn't hold up the pool
+            chunk = max(1, -(-page_count // (workers * 4)))
+
+            pdf_path = _worker_source(pdf_path)
+
+            starts = range(0, page_count, chunk)
+            stops = [min(s + chunk, page_count) for s in starts]
+
+            parts = []
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = pool.map(_parse_page_range, [pdf_path] * len(starts), starts, stops, [None] * len(starts), [single_pass] * len(starts))
+                for part, stop in zip(chunks, stops):
+                    parts.append(part)
+                    if progress: progress("pages", stop, page_count)
+            return merge_doctors(parts)
+
+    return _parse_page_range(pdf_path, progress=progress, single_pass=single_pass)
+
+def _parse_page_range(pdf_path, start=0, stop=None, progress=None, single_pass=True):
     """
+    Parses pages [start, stop) of the PDF. Returns a partial doctors dict.
+    """
+    import pdfplumber
+
     doctors = {}
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if not text: continue
-            
-            # 1. Extract Name
-            # The PDF text might be reversed (Right-to-Left characters stored Left-to-Right)
-            # We will try to find the name in both raw and reversed forms.
-            
-            lines = text.split('\n')
-            found_name = None
-            
-            for line in lines:
-                # cleanup
-                line = line.strip()
-                if not line: continue
+    names = {}  # name_key -> name in doctors
 
-                # Normalize Arabic Presentation Forms (to standard) (NFKC)
-                line = unicodedata.normalize('NFKC', line)
+    with metrics.stage("pdf_open"):
+        pdf = pdfplumber.open(_open_source(pdf_path))
+        pages = pdf.pages[start:stop]
 
-                # Remove Tatweels (Arabic elongation char)
-                line = re.sub(r'\u0640', '', line)
-                
-                # Check Normal
-                if "المحاضر" in line:
-                    # Regex for normal "المحاضر : Name"
-                    match = re.search(r"المحاضر\s*[:\-]?\s*(?P<name>.*?)\s*(?::|الرتبة|عبء|\n|$)", line)
-                    if match:
-                        found_name = match.group("name").strip()
-                        break
-                
-                # Check Reversed
-                rev_line = line[::-1]
-                if "المحاضر" in rev_line:
-                    match = re.search(r"المحاضر\s*[:\-]?\s*(?P<name>.*?)\s*(?::|الرتبة|عبء|\n|$)", rev_line)
-                    if match:
-                        found_name = match.group("name").strip()
-                        break
-            
-            if found_name:
-                name = found_name
+    with pdf:
+        for i, page in enumerate(pages):
+            if single_pass:
+                try:
+                    _parse_doctor_page(page, doctors, single_pass=True, names=names)
+                finally:
+                    # Drop the page's layout, objects and text caches
+                    page.close()
             else:
-                name = "Unknown Doctor"
+                _parse_doctor_page(page, doctors, names=names)
+            if progress: progress("pages", i + 1, len(pages))
 
-            # Normalize name (remove weird chars)
-            name = re.sub(r'[^\w\s\u0600-\u06FF]', '', name).strip()
-            
-            if not name: name = "Unknown Doctor"
+    return doctors
+
+def pdf_page_digests(pdf_path):
+    """
+    SHA-256 hex digest of each page's content, in page order: its decoded content
+    streams, page box and rotation, and everything its /Resources pull in (fonts with
+    their ToUnicode maps and font files, form XObjects with their own resources,
+    images). The same content stream can draw different text through different fonts
+    or XObjects, so the stream alone doesn't identify a page.
+    Much cheaper than parsing: no layout or text extraction.
+    """
+    import pdfplumber
+    from pdfminer.pdftypes import PDFStream, resolve1
+
+    digests = []
+    memo = {}  # Fonts and XObjects are usually shared by the pages, hash each once
+    with metrics.stage("pdf_digest"), pdfplumber.open(_open_source(pdf_path)) as pdf:
+        for page in pdf.pages:
+            page_obj = page.page_obj
+            h = hashlib.sha256(repr((page_obj.mediabox, page_obj.rotate)).encode())
+            for stream in page_obj.contents:
+                stream = resolve1(stream)
+                if isinstance(stream, PDFStream):
+                    h.update(stream.get_data())
+            h.update(_pdf_object_digest(page_obj.resources, memo))
+            digests.append(h.hexdigest())
+    return digests
+
+def _pdf_object_digest(obj, memo):
+    """
+    Digest of a PDF object with every reference in it followed: streams by their
+    attributes and raw bytes, dicts by sorted key. memo maps object ids to their
+    digest, so a shared object is hashed once and a reference cycle ends.
+    """
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+    if isinstance(obj, PDFObjRef):
+        objid = obj.objid
+        if objid not in memo:
+            memo[objid] = b"cycle"
+            memo[objid] = _pdf_object_digest(obj.resolve(), memo)
+        return memo[objid]
+
+    h = hashlib.sha256()
+    if isinstance(obj, PDFStream):
+        h.update(b"stream")
+        h.update(_pdf_object_digest(obj.attrs, memo))
+        h.update(obj.get_rawdata() or obj.get_data())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for key in sorted(obj, key=str):
+            if key == "Parent":
+                continue  # Back up the page tree, not something the page draws
+            h.update(repr(key).encode())
+            h.update(_pdf_object_digest(obj[key], memo))
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"list")
+        for item in obj:
+            h.update(_pdf_object_digest(item, memo))
+    else:
+        h.update(repr(obj).encode())
+    return h.digest()
+
+def parse_doctor_pages(pdf_path, page_numbers=None, workers=1, min_pages=PARALLEL_MIN_PAGES, progress=None):
+    """
+    Parses each of the given pages (0-based, default all) on its own.
+    Returns {page_number: partial doctors dict}; merge_doctors over those in page
+    order gives the same result as parse_doctors_pdf. Used to re-parse only changed pages.
+    """
+    import pdfplumber
+
+    if page_numbers is None:
+        with pdfplumber.open(_open_source(pdf_path)) as pdf:
+            page_numbers = range(len(pdf.pages))
+
+    return parse_pdfs_pages([pdf_path], [page_numbers], workers, min_pages, progress)[0]
+
+def parse_pdfs_pages(pdf_paths, page_numbers, workers=1, min_pages=PARALLEL_MIN_PAGES, progress=None):
+    """
+    parse_doctor_pages over several PDFs: page_numbers[k] are the pages wanted from
+    pdf_paths[k]. Returns one {page_number: partial doctors dict} per PDF.
+
+    With workers > 1 and at least min_pages pages in all, the pages of every file are
+    chunked into one process pool, so the files are parsed side by side.
+    """
+    page_numbers = [list(pages) for pages in page_numbers]
+    total = sum(len(pages) for pages in page_numbers)
+    results = [{} for _ in pdf_paths]
+    done = 0
+
+    if workers and workers > 1 and total >= min_pages:
+        chunk = max(1, -(-total // (workers * 4)))
+        tasks = []
+        for k, (pdf_path, pages) in enumerate(zip(pdf_paths, page_numbers)):
+            if not pages:
+                continue
+            pdf_path = _worker_source(pdf_path)
+            tasks += [(k, pdf_path, pages[i:i + chunk]) for i in range(0, len(pages), chunk)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_page_list, pdf_path, pages) for _, pdf_path, pages in tasks]
+            for (k, _, pages), future in zip(tasks, futures):
+                results[k].update(future.result())
+                done += len(pages)
+                if progress: progress("pages", done, total)
+        return results
+
+    for k, (pdf_path, pages) in enumerate(zip(pdf_paths, page_numbers)):
+        if not pages:
+            continue
+        file_progress = None
+        if progress:
+            file_progress = lambda stage, n, _, offset=done: progress(stage, offset + n, total)
+        results[k] = _parse_page_list(pdf_path, pages, file_progress)
+        done += len(pages)
+    return results
+
+def _parse_page_list(pdf_path, page_numbers, progress=None):
+    import pdfplumber
+
+    # {page_number: partial doctors dict} for the listed pages
+    results = {}
+
+    with metrics.stage("pdf_open"):
+        pdf = pdfplumber.open(_open_source(pdf_path))
+        pages = pdf.pages
+
+    with pdf:
+        for i, page_number in enumerate(page_numbers):
+            page = pages[page_number]
+            doctors = {}
+            try:
+                _parse_doctor_page(page, doctors, single_pass=True)
+            finally:
+                page.close()
+            results[page_number] = doctors
+            if progress: progress("pages", i + 1, len(page_numbers))
+
+    return results
+
+def _worker_source(pdf_path):
+    # Workers can't share a file object, give them the path or the bytes
+    if isinstance(pdf_path, (str, os.PathLike, bytes)):
+        return pdf_path
+    if isinstance(pdf_path, (bytearray, memoryview)):
+        return bytes(pdf_path)
+    return _open_source(pdf_path).read()
+
+def merge_doctors(parts):
+    """
+    Merges partial doctors dicts (in page order) of one PDF into one. Lecturers are
+    matched by name_key(), under the first spelling seen, like the serial parse does.
+    """
+    doctors = {}
+    names = {}  # name_key -> name in doctors
+
+    for part in parts:
+        for name, data in part.items():
+            key = name_key(name)
+            if key not in names:
+                names[key] = name
+                doctors[name] = data
+                continue
+            busy_slots = doctors[names[key]]["busy_slots"]
+            for day, slots in data["busy_slots"].items():
+                busy_slots.setdefault(day, []).extend(slots)
+
+    return doctors
+
+def merge_schedules(schedules):
+    """
+    Merges whole doctors dicts of several PDFs (e.g. one per department) into one.
+    Lecturers are matched by name_key(), under the first spelling seen, and slots a
+    lecturer already has aren't added again, since the files can overlap.
+    """
+    doctors = {}
+    names = {}  # name_key -> name in doctors
+    seen = {}   # (name in doctors, day) -> its slots there, as tuples
+
+    for schedule in schedules:
+        for name, data in schedule.items():
+            key = name_key(name)
+            if key not in names:
+                names[key] = name
+                doctors[name] = data
+                continue
+            name = names[key]
+            busy_slots = doctors[name]["busy_slots"]
+            for day, slots in data["busy_slots"].items():
+                day_slots = busy_slots.setdefault(day, [])
+                day_seen = seen.get((name, day))
+                if day_seen is None:
+                    day_seen = seen[(name, day)] = {tuple(slot) for slot in day_slots}
+                for slot in slots:
+                    if tuple(slot) not in day_seen:
+                        day_seen.add(tuple(slot))
+                        day_slots.append(slot)
 
-            if name not in doctors:
-                doctors[name] = {"busy_slots": {d: [] for d in ['Sun', 'Mon', 'Tue', 'Wed', 'Thu']}}
-            
-            # 2. Extract Table
-            table = page.extract_table()
-            if not table: continue
-            
-            # Identify columns
-            header_idx = -1
-            col_map = {}
-            header_keywords = {
-                "time": ["الوقت", "الزمن", "ﺖﻗﻮﻟﺍ", "ﻦﻣﺰﻟﺍ"],
-                "days": ["الأيام", "اليوم", "ﻡﺎﻳﻷﺍ", "ﻡﻮﻴﻟﺍ"]
-            }
-            
-            for i, row in enumerate(table):
-                clean_row = [str(c).strip() if c else "" for c in row]
-                temp_map = {}
-                for col_idx, cell_text in enumerate(clean_row):
-                    for key, keywords in header_keywords.items():
-                        if any(k in cell_text for k in keywords):
-                            temp_map[key] = col_idx
-                            break
-                if "time" in temp_map:
-                    header_idx = i
-                    col_map = temp_map
-                    break
-            
-            if header_idx != -1:
-                for row_idx in range(header_idx + 1, len(table)):
-                    row = table[row_idx]
-                    if not row: continue
-                    cleaned_row = [str(c).strip() if c else "" for c in row]
-                    
-                    try:
-                        time_str = cleaned_row[col_map["time"]] if "time" in col_map else ""
-                        days_str = cleaned_row[col_map["days"]] if "days" in col_map else ""
-                        if not time_str: continue
-                        
-                        parsed = parse_time_slot(time_str, days_str_fallback=days_str)
-                        
-                        for slot in parsed:
-                            for day in slot['days']:
-                                if day in doctors[name]["busy_slots"]:
-                                    doctors[name]["busy_slots"][day].append((slot['start'], slot['end']))
-                    except Exception:
-                        continue
-    
     return doctors
 
-def check_availability(exams, doctors_db):
+# Spelling variants folded by name_key: hamza forms of alef, alef maqsura, ta marbuta
+_NAME_FOLDS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"})
+# Tashkeel (harakat, tanween, shadda, sukun, dagger alef) and tatweel
+_NAME_MARKS_RE = re.compile(r'[\u064B-\u065F\u0670\u0640]')
+
+@lru_cache(maxsize=4096)
+def name_key(name):
+    """
+    Normalized lecturer name, for telling whether two schedule entries are the same
+    person: NFKC, no diacritics or tatweel, folded alef / ya / ta marbuta variants,
+    single spaces, case-folded.
+    """
+    name = _NAME_MARKS_RE.sub('', unicodedata.normalize('NFKC', name))
+    return " ".join(name.translate(_NAME_FOLDS).split()).casefold()
+
+def _parse_doctor_page(page, doctors, single_pass=False, names=None):
     """
-    Matches exams to available doctors.
+    Parses a single page of the doctor schedule into the doctors dict (in place).
+    With single_pass, the name is searched in text rebuilt from the page's chars,
+    which the table extraction then reuses.
+    names, if given, maps name_key() to the name in doctors: a lecturer spelled
+    differently on an earlier page gets this page's slots under that spelling.
     """
-    debug_first = True  # Only debug first exam
+    from pdfplumber.utils import extract_text
+
+    metrics.count("pages")
+    with metrics.stage("page_text"):
+        if single_pass:
+            text = extract_text(page.chars)
+        else:
+            text = page.extract_text()
+    if not text: return
+    
+    # 1. Extract Name
+    # The PDF text might be reversed (Right-to-Left characters stored Left-to-Right)
+    # We will try to find the name in both raw and reversed forms.
+    
+    lines = text.split('\n')
+    found_name = None
     
-    for exam in exams:
-        exam_day = exam.get("day_of_week")
+    for line in lines:
+        # cleanup
+        line = line.strip()
+        if not line: continue
+
+        # Normalize Arabic Presentation Forms (to standard) (NFKC)
+        line = unicodedata.normalize('NFKC', line)
+
+        # Remove Tatweels (Arabic elongation char)
+        line = re.sub(r'\u0640', '', line)
         
-        # If no day derived from date, try to parse date str to day
-        if not exam_day and exam.get("date"):
+        # Check Normal
+        if "المحاضر" in line:
+            # Regex for normal "المحاضر : Name"
+            match = re.search(r"المحاضر\s*[:\-]?\s*(?P<name>.*?)\s*(?::|الرتبة|عبء|\n|$)", line)
+            if match:
+                found_name = match.group("name").strip()
+                break
+        
+        # Check Reversed
+        rev_line = line[::-1]
+        if "المحاضر" in rev_line:
+            match = re.search(r"المحاضر\s*[:\-]?\s*(?P<name>.*?)\s*(?::|الرتبة|عبء|\n|$)", rev_line)
+            if match:
+                found_name = match.group("name").strip()
+                break
+    
+    if found_name:
+        name = found_name
+    else:
+        name = "Unknown Doctor"
+
+    # Normalize name (remove weird chars)
+    name = re.sub(r'[^\w\s\u0600-\u06FF]', '', name).strip()
+    
+    if not name: name = "Unknown Doctor"
+    if names is not None:
+        name = names.setdefault(name_key(name), name)
+
+    if name not in doctors:
+        doctors[name] = {"busy_slots": {d: [] for d in ['Sun', 'Mon', 'Tue', 'Wed', 'Thu']}}
+    
+    # 2. Extract Table
+    with metrics.stage("page_table"):
+        table = page.extract_table()
+    if not table: return
+    
+    # Identify columns
+    header_idx = -1
+    col_map = {}
+    header_keywords = {
+        "time": ["الوقت", "الزمن", "ﺖﻗﻮﻟﺍ", "ﻦﻣﺰﻟﺍ"],
+        "days": ["الأيام", "اليوم", "ﻡﺎﻳﻷﺍ", "ﻡﻮﻴﻟﺍ"]
+    }
+    
+    for i, row in enumerate(table):
+        clean_row = [str(c).strip() if c else "" for c in row]
+        temp_map = {}
+        for col_idx, cell_text in enumerate(clean_row):
+            for key, keywords in header_keywords.items():
+                if any(k in cell_text for k in keywords):
+                    temp_map[key] = col_idx
+                    break
+        if "time" in temp_map:
+            header_idx = i
+            col_map = temp_map
+            break
+    
+    if header_idx == -1:
+        return
+
+    # Timed per page, a stage per cell would cost more than the (cached) parse itself
+    with metrics.stage("time_slot"):
+        for row_idx in range(header_idx + 1, len(table)):
+            row = table[row_idx]
+            if not row: continue
+            cleaned_row = [str(c).strip() if c else "" for c in row]
+            
             try:
-                # Date format DD/MM/YYYY
-                dt = datetime.datetime.strptime(exam["date"], "%d/%m/%Y")
-                # Map python weekday (0=Mon) to our keys
-                py_days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-                # Adjust for our Sun-Thu map
-                # 6=Sun, 0=Mon, 1=Tue, 2=Wed, 3=Thu...
-                wd = dt.weekday() 
-                # Mapping might vary based on system, usually Mon=0
-                # Our keys: Sun, Mon, Tue, Wed, Thu
-                # Sunday is 6 in Py? Yes.
-                if wd == 6: exam_day = "Sun"
-                elif wd == 0: exam_day = "Mon"
-                elif wd == 1: exam_day = "Tue"
-                elif wd == 2: exam_day = "Wed"
-                elif wd == 3: exam_day = "Thu"
-                else: exam_day = None # Weekend (Fri/Sat)
+                time_str = cleaned_row[col_map["time"]] if "time" in col_map else ""
+                days_str = cleaned_row[col_map["days"]] if "days" in col_map else ""
+                if not time_str: continue
                 
-                exam["day_of_week"] = exam_day # Store back
-            except ValueError:
-                pass
+                parsed = parse_time_slot(time_str, days_str_fallback=days_str)
+                
+                for slot in parsed:
+                    for day in slot['days']:
+                        if day in doctors[name]["busy_slots"]:
+                            doctors[name]["busy_slots"][day].append((slot['start'], slot['end']))
+            except Exception:
+                continue
+
+def check_availability(exams, doctors_db, engine="index", progress=None, spans=None):
+    """
+    Matches exams to available doctors. Returns the exams list, each with "available_doctors".
+    See iter_availability for the engines and spans.
+    """
+    for _ in iter_availability(exams, doctors_db, engine=engine, progress=progress, spans=spans):
+        pass
+    return exams
+
+def iter_availability(exams, doctors_db, engine="index", progress=None, spans=None):
+    """
+    Matches exams to available doctors, yielding each exam as soon as its
+    "available_doctors" is filled in (exams may be any iterable, except for numpy).
+
+    engine="index" queries a BusyIndex built once for the whole doctors DB (or the
+    one passed in as doctors_db, e.g. the shared MappedIndex of DoctorsStore),
+    engine="numpy" computes the whole exams x doctors matrix at once (see BusyMatrix),
+    engine="python" scans every doctor's slots per exam (the reference implementation).
+    Whichever the engine, each distinct (weekday, start, end) is matched once and the
+    result copied to the other exams in that slot.
+
+    spans, if given, are the (start, end) minutes of each exam in the same order (e.g.
+    from the Exam records the dicts were made from), so the "HH:MM" strings aren't
+    parsed again.
+
+    progress, if given, is called as progress("exams", matched, total); total is None
+    when exams has no len().
+    """
+    from utils.model import DoctorsDB, min_to_time
+
+    debug_first = DEBUG_MATCHING  # Only debug first exam
+
+    index = None
+    if engine == "index" and hasattr(doctors_db, "busy_mask"):
+        # Already an index, query it as is
+        index = doctors_db
+    else:
+        # Convert the DB's "HH:MM" strings once (no-op if it's already a DoctorsDB)
+        doctors_db = DoctorsDB.coerce(doctors_db)
+        if engine == "index":
+            from utils.availability import BusyIndex
+            with metrics.stage("busy_index"):
+                index = BusyIndex(doctors_db)
+        elif engine not in ("python", "numpy"):
+            raise ValueError(f"Unknown availability engine: {engine}")
+    
+    matrix = None
+    if engine == "numpy":
+        from utils.availability import availability_matrix
+        exams = list(exams)  # The matrix needs every exam up front
+        # One matrix row per distinct (weekday, start, end), not per exam
+        matrix_rows = {}
+        for exam in exams:
+            exam_day = _resolve_exam_day(exam)
+            if exam_day:
+                matrix_rows.setdefault((exam_day, exam["start"], exam["end"]), len(matrix_rows))
+        slots = [{"day_of_week": day, "start": start, "end": end} for day, start, end in matrix_rows]
+        with metrics.stage("busy_matrix"):
+            names, matrix = availability_matrix(slots, doctors_db)
+
+    total = len(exams) if hasattr(exams, '__len__') else None
+    matched = 0
+    # Exams sharing a weekday and time range get the same doctors: match each range once
+    slot_doctors = {}
+
+    if spans is not None:
+        spans = iter(spans)
+
+    # Time spent matching only, not the time the consumer holds each yielded exam
+    elapsed = 0.0
+    try:
+        for i, exam in enumerate(exams):
+            t0 = time.perf_counter()
+            if progress: progress("exams", i, total)
+            span = next(spans) if spans is not None else None
+            exam_day = _resolve_exam_day(exam)
+            matched += 1
         
-        available_docs = []
+            available_docs = []
         
-        if not exam_day:
-            exam["available_doctors"] = ["Unknown Date/Day"]
-            continue
+            if not exam_day:
+                exam["available_doctors"] = [UNKNOWN_DAY]
+                elapsed += time.perf_counter() - t0
+                yield exam
+                continue
 
-        if debug_first:
-            print(f"\n[DEBUG check_availability for first exam]")
-            print(f"  Exam day: {exam_day}")
-            print(f"  Exam time: {exam['start']} - {exam['end']}")
+            slot = (exam_day, *span) if span is not None else (exam_day, exam["start"], exam["end"])
+            known = slot_doctors.get(slot)
+            if known is not None:
+                exam["available_doctors"] = list(known)
+                elapsed += time.perf_counter() - t0
+                yield exam
+                continue
 
-        start_min = time_to_min(exam["start"])
-        end_min = time_to_min(exam["end"])
+            if debug_first:
+                print(f"\n[DEBUG check_availability for first exam]")
+                print(f"  Exam day: {exam_day}")
+                print(f"  Exam time: {exam['start']} - {exam['end']}")
+
+            if span is not None:
+                start_min, end_min = span
+            else:
+                start_min = time_to_min(exam["start"])
+                end_min = time_to_min(exam["end"])
         
-        if debug_first:
-            print(f"  Exam minutes: {start_min} - {end_min}")
+            if debug_first:
+                print(f"  Exam minutes: {start_min} - {end_min}")
         
-        for doc_name, doc_data in doctors_db.items():
-            is_free = True
-            busy_on_day = doc_data["busy_slots"].get(exam_day, [])
+            if index is not None:
+                available_docs = index.free_doctors(exam_day, start_min, end_min)
+            elif matrix is not None:
+                row = matrix_rows[(exam_day, exam["start"], exam["end"])]
+                available_docs = [names[j] for j in matrix[row].nonzero()[0]]
+            else:
+                for doctor in doctors_db:
+                    doc_name = doctor.name
+                    is_free = True
+                    busy_on_day = doctor.slots(exam_day)
             
-            if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
-                print(f"\n  [Checking Dr. Ahmed]")
-                print(f"    Doctor: {doc_name[:50]}...")
-                print(f"    Busy slots on {exam_day}: {busy_on_day}")
+                    if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
+                        print(f"\n  [Checking Dr. Ahmed]")
+                        print(f"    Doctor: {doc_name[:50]}...")
+                        print(f"    Busy slots on {exam_day}: {busy_on_day}")
             
-            for b_start, b_end in busy_on_day:
-                b_s_min = time_to_min(b_start)
-                b_e_min = time_to_min(b_end)
+                    for b_s_min, b_e_min in busy_on_day:
                 
-                # Check Overlap
-                # Overlap if (StartA < EndB) and (EndA > StartB)
-                if start_min < b_e_min and end_min > b_s_min:
-                    is_free = False
-                    if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
-                        print(f"    Slot {b_start}-{b_end}: OVERLAP! is_free=False")
-                    break
-                elif debug_first and ("احمد" in doc_name and "عماد" in doc_name):
-                    print(f"    Slot {b_start}-{b_end}: No overlap")
+                        # Check Overlap
+                        # Overlap if (StartA < EndB) and (EndA > StartB)
+                        if start_min < b_e_min and end_min > b_s_min:
+                            is_free = False
+                            if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
+                                print(f"    Slot {min_to_time(b_s_min)}-{min_to_time(b_e_min)}: OVERLAP! is_free=False")
+                            break
+                        elif debug_first and ("احمد" in doc_name and "عماد" in doc_name):
+                            print(f"    Slot {min_to_time(b_s_min)}-{min_to_time(b_e_min)}: No overlap")
             
-            if is_free:
-                available_docs.append(doc_name)
-                if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
-                    print(f"    Result: ADDED to available list (WRONG!)")
-            elif debug_first and ("احمد" in doc_name and "عماد" in doc_name):
-                print(f"    Result: NOT added (correct)")
+                    if is_free:
+                        available_docs.append(doc_name)
+                        if debug_first and ("احمد" in doc_name and "عماد" in doc_name):
+                            print(f"    Result: ADDED to available list (WRONG!)")
+                    elif debug_first and ("احمد" in doc_name and "عماد" in doc_name):
+                        print(f"    Result: NOT added (correct)")
         
-        exam["available_doctors"] = available_docs
+            exam["available_doctors"] = available_docs
+            slot_doctors[slot] = tuple(available_docs)
         
-        if debug_first:
-            print(f"\n  Total available: {len(available_docs)}")
-            ahmed_in = any("احمد" in d and "عماد" in d for d in available_docs)
-            print(f"  Ahmed in list: {ahmed_in}\n")
-            debug_first = False  # Only debug first exam
-        
-    return exams
+            if debug_first:
+                print(f"\n  Total available: {len(available_docs)}")
+                ahmed_in = any("احمد" in d and "عماد" in d for d in available_docs)
+                print(f"  Ahmed in list: {ahmed_in}\n")
+                debug_first = False  # Only debug first exam
+
+            elapsed += time.perf_counter() - t0
+            yield exam
+    finally:
+        metrics.record("match", elapsed)
+        metrics.count("exams_matched", matched)
+        metrics.count("exam_slots", len(slot_doctors))
+
+    if progress: progress("exams", matched, total if total is not None else matched)
+
+def _resolve_exam_day(exam):
+    """
+    Returns the exam's weekday key, deriving it from exam["date"] (and storing it back) if needed.
+    """
+    exam_day = exam.get("day_of_week")
+    
+    # If no day derived from date, try to parse date str to day
+    if not exam_day and exam.get("date"):
+        day = _date_weekday(exam["date"])
+        if day is not _BAD_DATE:
+            exam_day = day
+            exam["day_of_week"] = exam_day # Store back
+
+    return exam_day
+
+# Python weekday (Mon=0 .. Sun=6) -> our Sun-Thu keys, Fri/Sat are not teaching days
+_PY_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", None, None, "Sun")
+_BAD_DATE = object()
+
+@lru_cache(maxsize=4096)
+def _date_weekday(date_str):
+    # A timetable has a few dozen distinct dates, so each is parsed once
+    try:
+        # Date format DD/MM/YYYY
+        return _PY_WEEKDAYS[datetime.datetime.strptime(date_str, "%d/%m/%Y").weekday()]
+    except ValueError:
+        return _BAD_DATE
 
 def time_to_min(t_str):
     try:
@@ -328,174 +761,86 @@ def parse_time_slot(time_str, days_str_fallback="", is_exam=False):
     
     return all_results
 
+# Tables for the time slot tokenizer, built once instead of per call
+TIME_SLOT_CACHE_SIZE = 8192
+
+_TIME_RE = re.compile(r'(\d{1,2}:\d{2})')
+_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{4}')
+
+# Day letters after NFKC. The full names contain the same letters ('الأحد' has 'ح'),
+# and dash-joined tokens like "ﺭ-ﻥ" (Wed-Mon) simply contain several of them.
+_ARABIC_DAYS = (('ح', 'Sun'), ('ن', 'Mon'), ('ث', 'Tue'), ('ر', 'Wed'), ('خ', 'Thu'))
+# 'Sun', 'Sunday' and 'Sun.' all contain the lowercase prefix
+_ENGLISH_DAYS = (('sun', 'Sun'), ('mon', 'Mon'), ('tue', 'Tue'), ('wed', 'Wed'), ('thu', 'Thu'))
+
+
 def _parse_single_time_slot(time_str, days_str_fallback="", is_exam=False):
     """
     Internal function to parse a single line of time slot data.
+    The same cell text repeats all over a schedule, so the scan is memoized and
+    each call gets its own copy of the result.
     """
-    results = []
-    
-    # Normalize input
+    return [dict(slot, days=list(slot["days"])) for slot in _scan_time_slot(time_str, days_str_fallback, is_exam)]
+
+
+@lru_cache(maxsize=TIME_SLOT_CACHE_SIZE)
+def _scan_time_slot(time_str, days_str_fallback, is_exam):
     raw = time_str
     if days_str_fallback:
         raw += " " + days_str_fallback
-        
-    # Clean up standard chars
     raw = raw.replace('_', '-').replace('–', '-')
-    
-    # 1. Normalize and check direction
-    # If the string looks like "( ... )", it might be reversed if parenthesis are backwards?
-    # Actually, in PDF dump: "( ﻞﻣﺎﻛ ﻲﻫﺎﺟﻭ , ﺙ ,14:30_13:00 )"
-    # The parenthesis seem correct order physically in the string? "(" at start, ")" at end.
-    # But words inside are reversed.
-    # The time "14:30_13:00" is also reversed range logic? 
-    #   13:00 -> 14:30. "14:30_13:00" means Start=14:30? No.
-    #   Usually "Start_End". If visually reversed, might be "End_Start".
-    
-    # Let's handle generic Time extraction first.
-    # Find all HH:MM
-    times = re.findall(r'(\d{1,2}:\d{2})', raw)
-    
-    start_time = "00:00"
-    end_time = "00:00"
-    
+
+    # 1. Times. With two or more, take the earliest and latest: the PDFs show ranges
+    # both as "Start_End" and visually reversed as "End_Start".
+    times = _TIME_RE.findall(raw)
     if len(times) >= 2:
-        # We sort them to get Earliest and Latest, assuming standard class block.
-        # This avoids conflict with "Start-End" vs "End-Start" ordering unless class crosses midnight.
         t_list = []
         for t in times:
             h, m = map(int, t.split(':'))
-            
-            # CRITICAL FIX: Detect if this is a PM time in 12-hour format
             # Exam schedules use 12-hour format (1:00 = 1 PM), doctor schedules use 24-hour
-            if is_exam and h >= 1 and h <= 6:
-                # This is a 12-hour PM time from exam schedule
-                # Convert 1:00 -> 13:00, 2:00 -> 14:00, etc.
+            if is_exam and 1 <= h <= 6:
                 h += 12
-            
-            t_list.append((h, m, f"{h:02d}:{m:02d}"))
-        
-        t_list.sort() # Sort by hour, then minute
-        
-        start_time = t_list[0][2]
-        end_time = t_list[-1][2]
-        
+            t_list.append((h, m))
+        start_time = "%02d:%02d" % min(t_list)
+        end_time = "%02d:%02d" % max(t_list)
     elif len(times) == 1:
-        start_time = times[0]
-        end_time = times[0]
+        start_time = end_time = times[0]  # Invalid duration
+    else:
+        return ()
 
-    # ... (rest of function)
-    elif len(times) == 1:
-        start_time = times[0]
-        end_time = times[0] # Invalid duration
-        
     if start_time == "00:00":
-        return []
-
-    # 2. Extract Date (DD/MM/YYYY)
-    date_found = ""
-    # Look for DD/MM/YYYY or DD-MM-YYYY
-    date_match = re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{4}', raw)
-    if date_match:
-        date_found = date_match.group(0)
-
-    # 3. Extract Days
-    # Standard English
-    found_days = []
-    day_map_en = {
-        'Sun': ['Sun', 'Sunday', 'Sun.'],
-        'Mon': ['Mon', 'Monday', 'Mon.'],
-        'Tue': ['Tue', 'Tuesday', 'Tue.'],
-        'Wed': ['Wed', 'Wednesday', 'Wed.'],
-        'Thu': ['Thu', 'Thursday', 'Thu.']
-    }
-    
-    # Arabic letters/words
-    # User clarification: "ث" might be Monday or Tuesday? Standard is Tuesday (Thulatha). 
-    # "ن" is Monday (Ithnain). "ر" is Wednesday (Arbia/Rabia).
-    # We will map "ث" -> Tue, "ن" -> Mon, "ر" -> Wed, "ح" -> Sun, "خ" -> Thu.
-    # We also check for full words.
-    
-    # Checking raw string for arabic chars
-    # We normalized NFKC in checking names, but here we might get raw chars.
-    # Let's clean the string of parentheses and comman
-    clean_raw = re.sub(r'[(),]', ' ', raw)
-    
-    # Also create a reversed version of raw to check against
-    # Because "Wednesday" might be "ﺭ" or reversed word
-    
-    for word in clean_raw.split():
-        word = word.strip()
-        if not word: continue
-        # Normalize
-        word_norm = unicodedata.normalize('NFKC', word)
-        
-        # Check standard
-        if 'ح' in word_norm or 'الأحد' in word_norm: found_days.append('Sun')
-        if 'ن' in word_norm or 'الاثنين' in word_norm or 'الأثنين' in word_norm: found_days.append('Mon')
-        if 'ث' in word_norm or 'الثلاثاء' in word_norm: found_days.append('Tue')
-        if 'ر' in word_norm or 'الأربعاء' in word_norm or 'الاربعاء' in word_norm: found_days.append('Wed')
-        if 'خ' in word_norm or 'الخميس' in word_norm: found_days.append('Thu')
-        
-        # Check Reversed Word (Common in PDF tables)
-        # "الأحد" -> "ﺪﺣﻷﺍ"
-        word_rev = word_norm[::-1] 
-        # Note: Single letters like 'ن' reversed are just 'ن' (visually same if isolated, but here we handled string reversal earlier?)
-        # Actually proper Arabic shaping reversal is complex.
-        # But let's check for specific known reversed-chars if simple reverse doesn't work.
-        pass # The single letter check above handles 'ن' etc if they are separated.
-        
-        # If the word is "ﺭ-ﻥ", split failed? 
-        # "ﺭ-ﻥ" -> "R-N" -> Wed-Mon.
-        # It's likely one token "ﺭ-ﻥ".
-        if '-' in word_norm:
-            parts = word_norm.split('-')
-            for p in parts:
-                p = p.strip()
-                if 'ح' in p: found_days.append('Sun')
-                if 'ن' in p: found_days.append('Mon')
-                if 'ث' in p: found_days.append('Tue')
-                if 'ر' in p: found_days.append('Wed')
-                if 'خ' in p: found_days.append('Thu')
-    
-    # Deduplicate
-    found_days = list(set(found_days))
-    
-    # Fallback to defaults or Date derived
-    if not found_days and date_found:
-        # derive from date
-        pass # Handled in check_availability
+        return ()
+
+    # 2. Date (DD/MM/YYYY or DD-MM-YYYY)
+    date_match = _DATE_RE.search(raw)
+    date_found = date_match.group(0) if date_match else ""
+
+    # 3. Days: one NFKC pass over the whole line, then a lookup per day letter
+    norm = unicodedata.normalize('NFKC', raw)
+    found_days = tuple(day for letter, day in _ARABIC_DAYS if letter in norm)
 
-    # If parsing a "General" schedule (like specific date exam), days might be none.
-    # But if weekly, we need days.
-    
     if not found_days and not date_found:
-        # Try finding english days
-        for key, arr in day_map_en.items():
-            if any(x.lower() in raw.lower() for x in arr):
-                found_days.append(key)
-
-    if found_days:
-        results.append({
-            "start": start_time,
-            "end": end_time,
-            "days": found_days,
-            "date": date_found
-        })
-    elif date_found:
-        # Valid single date event
-        results.append({
-            "start": start_time,
-            "end": end_time,
-            "days": [],
-            "date": date_found
-        })
-        
-    return results
+        lowered = raw.lower()
+        found_days = tuple(day for prefix, day in _ENGLISH_DAYS if prefix in lowered)
 
-def calculate_free_time(courses):
+    if not found_days and not date_found:
+        return ()
+
+    return ({
+        "start": start_time,
+        "end": end_time,
+        "days": found_days,
+        "date": date_found
+    },)
+
+def calculate_free_time(courses, day_start=8 * 60, day_end=16 * 60, min_gap=15):
     """
-    Calculates gaps between 08:00 and 16:00 (standard uni day).
+    Calculates gaps between 08:00 and 16:00 (standard uni day), or the given window in minutes.
+    Course start/end may be "HH:MM" strings or minutes (as in utils.model).
+    For every doctor in a schedule at once, use utils.freetime.FreeTimeTable.
     """
+    from utils.model import merge_intervals, free_gaps, min_to_time
+
     day_schedule = {d: [] for d in ['Sun', 'Mon', 'Tue', 'Wed', 'Thu']}
     
     for course in courses:
@@ -505,10 +850,6 @@ def calculate_free_time(courses):
                 
     free_slots_by_day = {}
     
-    # Define working hours
-    STANDARD_START = 8 * 60
-    STANDARD_END = 16 * 60
-    
     for day, times in day_schedule.items():
         if not times:
             continue
@@ -516,49 +857,23 @@ def calculate_free_time(courses):
         # Convert to minutes
         time_mins = []
         for start, end in times:
+            if isinstance(start, int) and isinstance(end, int):
+                time_mins.append((start, end))
+                continue
             try:
                 s_h, s_m = map(int, start.split(':'))
                 e_h, e_m = map(int, end.split(':'))
                 time_mins.append((s_h*60 + s_m, e_h*60 + e_m))
             except ValueError:
                 continue
-            
-        # Sort by start time
-        time_mins.sort()
         
         if not time_mins:
             continue
             
-        merged = []
-        curr_start, curr_end = time_mins[0]
-        for i in range(1, len(time_mins)):
-            next_start, next_end = time_mins[i]
-            if next_start < curr_end:
-                curr_end = max(curr_end, next_end)
-            else:
-                merged.append((curr_start, curr_end))
-                curr_start, curr_end = next_start, next_end
-        merged.append((curr_start, curr_end))
-        
-        # Calculate gaps
-        gaps = []
-        last_end = STANDARD_START
-        
-        for start, end in merged:
-            if start > last_end:
-                gaps.append((last_end, start))
-            last_end = max(last_end, end)
-            
-        if last_end < STANDARD_END:
-            gaps.append((last_end, STANDARD_END))
+        gaps = free_gaps(merge_intervals(time_mins), day_start, day_end, min_gap)
             
         # Format gaps
-        formatted_gaps = []
-        for s, e in gaps:
-            if e - s >= 15:
-                s_str = f"{s//60:02d}:{s%60:02d}"
-                e_str = f"{e//60:02d}:{e%60:02d}"
-                formatted_gaps.append(f"{s_str} - {e_str}")
+        formatted_gaps = [f"{min_to_time(s)} - {min_to_time(e)}" for s, e in gaps]
         
         if formatted_gaps:
             free_slots_by_day[day] = formatted_gaps
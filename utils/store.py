@@ -0,0 +1,396 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from utils.availability import BusyIndex
+from utils.freetime import FreeTimeTable
+from utils.mapped_index import open_index, publish
+from utils.model import DoctorsDB
+from utils.parser import pdf_page_digests, parse_pdfs_pages, merge_doctors, merge_schedules, name_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- Parse result of every page seen, keyed by the page's content digest
+CREATE TABLE IF NOT EXISTS pages (
+    digest TEXT PRIMARY KEY,
+    result TEXT NOT NULL,       -- JSON partial doctors dict
+    last_seen REAL NOT NULL
+);
+-- Page digests of the current schedule PDF, in page order
+CREATE TABLE IF NOT EXISTS layout (
+    position INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    name TEXT PRIMARY KEY,
+    busy_slots TEXT NOT NULL,   -- JSON {"Sun": [["08:00", "09:30"], ...], ...}
+    position INTEGER NOT NULL,  -- order of first appearance in the PDF
+    updated REAL NOT NULL
+);
+"""
+
+
+class DoctorsStore:
+    """
+    SQLite copy of the current faculty schedule, so exams can be matched without
+    uploading the doctors PDF again.
+
+    Each page's parse result is stored under a hash of the page content. A new PDF
+    only has its new or changed pages parsed; the lecturers whose timetables changed
+    are upserted and the ones no longer in the PDF removed. `version` goes up on
+    every change, so callers can cache whatever they derive from load().
+
+    Every change also publishes a memory-mapped index of the schedule to index_dir
+    (default: next to the database), which busy_index() hands out, so all the
+    workers share one copy and pick a new schedule up without reading it back.
+    The index is tagged with the database's store_id (made when the database is
+    created), so an index left by another database at index_dir is never used.
+    """
+
+    def __init__(self, path, parser_version, page_ttl=30 * 24 * 3600, index_dir=None):
+        self.path = path
+        self.index_dir = index_dir or f"{path}.index"
+        self.parser_version = str(parser_version)
+        self.page_ttl = page_ttl
+        self._lock = threading.Lock()
+        self._loaded = (None, None)  # (version, DoctorsDB)
+        self._free_time = {}         # (version, window...) -> FreeTimeTable
+        self._index = (None, None)   # (version, MappedIndex or BusyIndex)
+        self._build_lock = threading.Lock()  # so concurrent requests build each of those once
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # First one to open a new database names it; the others read that back
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+            self.store_id = self._meta(conn, "store_id")
+            # Page results from another parser version can't be reused
+            if self._meta(conn, "parser_version") != self.parser_version:
+                conn.execute("DELETE FROM pages")
+                conn.execute("DELETE FROM meta WHERE key = 'pdf_digest'")
+                self._set_meta(conn, parser_version=self.parser_version)
+
+    def update_from_pdf(self, source, digest=None, workers=1, progress=None):
+        """
+        Makes the given doctors PDF (path, bytes or file object) the current schedule.
+        digest, the SHA-256 of the whole file, skips even the page hashing when the
+        file is the current one. Returns counts of what was parsed and changed.
+        """
+        return self.update_from_pdfs([source], [digest], workers, progress)
+
+    def update_from_pdfs(self, sources, digests=None, workers=1, progress=None):
+        """
+        Like update_from_pdf for several PDFs (e.g. one per department) that together
+        make the current schedule. They are merged in order; a lecturer found in
+        several files (by name_key) gets one entry with each distinct slot once.
+        The result also has "files": per PDF, its page counts and the (merged) names
+        of the doctors it lists, and "db": the schedule this call committed, as a
+        DoctorsDB at "version". Answer the request that uploaded the PDFs from those
+        (e.g. busy_index((version, db))), not from load(): another worker may have
+        stored a different schedule by then.
+        """
+        digests = list(digests) if digests else [None] * len(sources)
+        # The whole set's digest, for the unchanged-upload shortcut
+        set_digest = ",".join(digests) if all(digests) else None
+
+        with closing(self._connect()) as conn, conn:
+            # One read transaction, so the digest, layout and version belong together
+            conn.execute("BEGIN")
+            if set_digest and set_digest == self._meta(conn, "pdf_digest"):
+                page_counts = json.loads(self._meta(conn, "pdf_pages") or "[]")
+                layout = [d for d, in conn.execute("SELECT digest FROM layout ORDER BY position")]
+                if len(page_counts) == len(sources) and sum(page_counts) == len(layout):
+                    version = self._version(conn)
+                    file_digests = _split(layout, page_counts)
+                    known = self._page_results(conn, layout)
+                    file_dbs = [merge_doctors([json.loads(known[d]) for d in pages]) for pages in file_digests]
+                    doctors = _merge_files(file_dbs)
+                    files = _file_summaries(file_digests, [{}] * len(sources), file_dbs, doctors)
+                    loaded_version, db = self._loaded
+                    if db is None or loaded_version != version:
+                        db = DoctorsDB.from_dict(doctors)
+                    return {"pages": len(layout), "parsed": 0, "upserted": 0, "removed": 0,
+                            "version": version, "files": files, "db": db}
+
+        file_digests = [pdf_page_digests(source) for source in sources]
+        layout = [d for pages in file_digests for d in pages]
+
+        with closing(self._connect()) as conn:
+            known = self._page_results(conn, layout)
+
+        # Parse each new page content once, even if it repeats (in any of the files)
+        first_page = {}
+        for k, pages in enumerate(file_digests):
+            for page_number, page_digest in enumerate(pages):
+                if page_digest not in known:
+                    first_page.setdefault(page_digest, (k, page_number))
+        wanted = [[] for _ in sources]
+        for k, page_number in first_page.values():
+            wanted[k].append(page_number)
+        parsed = parse_pdfs_pages(sources, wanted, workers=workers, progress=progress)
+        new_pages = {file_digests[k][n]: json.dumps(result, ensure_ascii=False)
+                     for k, results in enumerate(parsed) for n, result in results.items()}
+        known.update(new_pages)
+
+        # Merge each file in page order, exactly like parse_doctors_pdf, then the files
+        file_dbs = [merge_doctors([json.loads(known[d]) for d in pages]) for pages in file_digests]
+        doctors = _merge_files(file_dbs)
+        files = _file_summaries(file_digests, parsed, file_dbs, doctors)
+
+        # What the store holds at `version` once written: the rows below, or equal to them
+        db = DoctorsDB.from_dict(doctors)
+
+        # Hashing and parsing above run unlocked, so a slow upload doesn't hold up the
+        # others. _lock covers only the write and the cache update that goes with it, so
+        # this process's updates land in commit order; BEGIN IMMEDIATE does that between
+        # processes.
+        now = time.time()
+        with self._lock:
+            with closing(self._connect()) as conn, conn:
+                # Take the write lock before reading, so an upload in another worker
+                # can't land between the diff and the writes based on it
+                conn.execute("BEGIN IMMEDIATE")
+                stored = {}
+                for name, busy, position in conn.execute("SELECT name, busy_slots, position FROM doctors"):
+                    stored[name] = (busy, position)
+
+                upserts, moved = [], []
+                for position, (name, data) in enumerate(doctors.items()):
+                    busy = json.dumps(data["busy_slots"], ensure_ascii=False)
+                    old_busy, old_position = stored.get(name, (None, None))
+                    if old_busy != busy:
+                        upserts.append((name, busy, position, now))
+                    elif old_position != position:
+                        moved.append((position, name))
+                removed = [(name,) for name in stored if name not in doctors]
+
+                conn.executemany(
+                    "INSERT INTO doctors (name, busy_slots, position, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET busy_slots = excluded.busy_slots, "
+                    "position = excluded.position, updated = excluded.updated", upserts)
+                conn.executemany("UPDATE doctors SET position = ? WHERE name = ?", moved)
+                conn.executemany("DELETE FROM doctors WHERE name = ?", removed)
+
+                conn.executemany("INSERT OR REPLACE INTO pages (digest, result, last_seen) VALUES (?, ?, ?)",
+                                 [(d, result, now) for d, result in new_pages.items()])
+                conn.executemany("UPDATE pages SET last_seen = ? WHERE digest = ?",
+                                 [(now, d) for d in set(layout) - set(new_pages)])
+                conn.execute("DELETE FROM pages WHERE last_seen < ?", (now - self.page_ttl,))
+
+                conn.execute("DELETE FROM layout")
+                conn.executemany("INSERT INTO layout (position, digest) VALUES (?, ?)", enumerate(layout))
+
+                version = self._version(conn) + (1 if upserts or moved or removed else 0)
+                self._set_meta(conn, pdf_digest=set_digest or "", version=version, updated=now,
+                               pdf_pages=json.dumps([len(pages) for pages in file_digests]))
+            self._loaded = (version, db)
+
+        if upserts or moved or removed:
+            index = self._publish(version, db)
+            if index is not None:
+                with self._lock:
+                    # A later update may have published its index while this one wrote the file
+                    if self._index[0] is None or self._index[0] < version:
+                        self._index = (version, index)
+
+        return {"pages": len(layout), "parsed": sum(len(results) for results in parsed),
+                "upserted": len(upserts), "removed": len(removed), "version": version, "files": files,
+                "db": db}
+
+    def load(self):
+        """
+        The stored schedule as a DoctorsDB (in PDF order). Cached until the next change,
+        so treat it as read-only.
+        """
+        return self._load()[1]
+
+    def snapshot(self):
+        """
+        (version, DoctorsDB) of the stored schedule, read together. Pass it on to
+        busy_index() to match against that same schedule.
+        """
+        return self._load()
+
+    def _load(self):
+        # (version, DoctorsDB), the version being the one the DoctorsDB was read at
+        with closing(self._connect()) as conn:
+            version = self._version(conn)
+            loaded = self._loaded
+            if loaded[1] is not None and loaded[0] == version:
+                return loaded
+
+            with self._build_lock:
+                loaded = self._loaded
+                if loaded[1] is not None and loaded[0] == version:
+                    return loaded
+                # One read transaction, so the rows match the version
+                with conn:
+                    conn.execute("BEGIN")
+                    version = self._version(conn)
+                    rows = conn.execute("SELECT name, busy_slots FROM doctors ORDER BY position")
+                    db = DoctorsDB.from_dict({name: {"busy_slots": json.loads(busy)} for name, busy in rows})
+                self._loaded = (version, db)
+                return self._loaded
+
+    def free_time(self, day_start=8 * 60, day_end=16 * 60, min_gap=15):
+        """
+        FreeTimeTable of the stored schedule for this window. Computed once per
+        schedule version and window, after that it's a lookup.
+        """
+        version, db = self._load()
+        key = (version, day_start, day_end, min_gap)
+
+        table = self._free_time.get(key)
+        if table is None:
+            with self._build_lock:
+                table = self._free_time.get(key)
+                if table is None:
+                    table = FreeTimeTable(db, day_start, day_end, min_gap)
+                    # Keep only the current version's tables, and not too many windows of it
+                    tables = {k: v for k, v in self._free_time.items() if k[0] == version}
+                    if len(tables) >= 16:
+                        tables.clear()
+                    tables[key] = table
+                    self._free_time = tables
+        return table
+
+    def busy_index(self, snapshot=None):
+        """
+        Index of the stored schedule (BusyIndex interface) for matching and free-doctor
+        queries: the shared MappedIndex, or a BusyIndex of this process's own if the
+        index file can't be used. Only looked at again when the schedule changes.
+
+        snapshot, a (version, DoctorsDB) from snapshot() or update_from_pdfs, asks for
+        the index of exactly that schedule: if the store has moved on since, that's a
+        BusyIndex of the snapshot's DoctorsDB.
+        """
+        if snapshot is not None:
+            version, db = snapshot
+            index_version, index = self._index
+            if index is not None and index_version == version:
+                return index
+            # Each version's file is written once, so it's the snapshot's if it's there
+            index = open_index(self.index_dir, version, self.store_id)
+            return index if index is not None else BusyIndex(db)
+
+        with closing(self._connect()) as conn:
+            version = self._version(conn)
+        index_version, index = self._index
+        if index is not None and index_version == version:
+            return index
+
+        # Usually another worker (or the last update) published it already
+        index = open_index(self.index_dir, version, self.store_id)
+        if index is None:
+            version, db = self._load()
+            with self._build_lock:
+                index_version, index = self._index
+                if index is not None and index_version == version:
+                    return index
+                index = self._publish(version, db)
+                if index is None:
+                    index = BusyIndex(db)
+        self._index = (version, index)
+        return index
+
+    def _publish(self, version, db):
+        # MappedIndex of a freshly published index file, None if it can't be written
+        try:
+            publish(self.index_dir, version, db, self.store_id)
+        except OSError as e:
+            print(f"Warning: could not write the doctors index to {self.index_dir}: {e}")
+            return None
+        return open_index(self.index_dir, version, self.store_id)
+
+    def doctor(self, name):
+        """
+        {"busy_slots": {...}} for one lecturer, None if not in the store.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT busy_slots FROM doctors WHERE name = ?", (name,)).fetchone()
+        return {"busy_slots": json.loads(row[0])} if row else None
+
+    def names(self, query="", limit=None, offset=0):
+        """
+        Lecturer names in PDF order, optionally only those containing `query`.
+        """
+        sql = "SELECT name FROM doctors WHERE instr(name, ?) > 0 ORDER BY position LIMIT ? OFFSET ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, (query, -1 if limit is None else limit, offset))
+            return [name for name, in rows]
+
+    def info(self):
+        with closing(self._connect()) as conn:
+            updated = self._meta(conn, "updated")
+            return {
+                "version": self._version(conn),
+                "doctors": self._count(conn, "doctors"),
+                "pages": self._count(conn, "layout"),
+                "updated": float(updated) if updated else None,
+            }
+
+    @staticmethod
+    def _page_results(conn, digests):
+        # {digest: JSON result} for the stored pages among these digests
+        known = {}
+        unique = list(dict.fromkeys(digests))
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = conn.execute(
+                f"SELECT digest, result FROM pages WHERE digest IN ({','.join('?' * len(batch))})", batch)
+            known.update(rows)
+        return known
+
+    def _connect(self):
+        # One short-lived connection per call, so the store is safe across threads and workers
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _meta(conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [(k, str(v)) for k, v in values.items()])
+
+    def _version(self, conn):
+        return int(self._meta(conn, "version") or 0)
+
+    @staticmethod
+    def _count(conn, table):
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _split(items, counts):
+    # [a, b, c, d, e], [2, 3] -> [[a, b], [c, d, e]]
+    out, i = [], 0
+    for n in counts:
+        out.append(items[i:i + n])
+        i += n
+    return out
+
+
+def _merge_files(file_dbs):
+    # One PDF is stored exactly as parsed; only separate files are merged by name_key
+    if len(file_dbs) == 1:
+        return file_dbs[0]
+    return merge_schedules(file_dbs)
+
+
+def _file_summaries(file_digests, parsed, file_dbs, doctors):
+    # Per-file provenance, with doctor names as they appear in the merged schedule
+    merged_names = {}
+    for name in doctors:
+        merged_names.setdefault(name_key(name), name)
+    return [{"pages": len(pages), "parsed": len(results),
+             "doctors": list(dict.fromkeys(name if name in doctors else merged_names[name_key(name)]
+                                           for name in db))}
+            for pages, results, db in zip(file_digests, parsed, file_dbs)]
@@ -0,0 +1,378 @@
+"""
+Synthetic schedules in the real upload formats, for benchmarks, load tests and warm-up.
+
+doctors_pdf() writes a master doctor schedule the way the faculty PDFs store it:
+Arabic in presentation forms and visual (reversed) order, one lecturer per page with
+an "المحاضر : name" header and a ruled timetable whose time cells look like
+"13:00_14:30 , ث" or "( ﻞﻣﺎﻛ ﻲﻫﺎﺟﻭ , ﺭ-ﻥ ,10:00_08:30 )".
+exams_docx() writes an exam timetable with dates and 12-hour times.
+doctors_dict() and exam_dicts() skip the files and give parsed-shape data directly,
+for benchmarks at sizes where generating and parsing files would dominate.
+"""
+import datetime
+import io
+import random
+import unicodedata
+import zipfile
+import zlib
+
+
+def _presentation_forms():
+    # {letter: {"isolated"/"final"/"initial"/"medial": form}} and lam-alef ligatures,
+    # read from the Unicode decompositions of the Arabic Presentation Forms-B block
+    forms = {}
+    ligatures = {}
+    for cp in range(0xFE70, 0xFF00):
+        decomposition = unicodedata.decomposition(chr(cp))
+        if not decomposition.startswith('<'):
+            continue
+        tag, _, rest = decomposition.partition(' ')
+        parts = tuple(chr(int(p, 16)) for p in rest.split())
+        if len(parts) == 1:
+            forms.setdefault(parts[0], {})[tag[1:-1]] = chr(cp)
+        elif len(parts) == 2:
+            ligatures.setdefault(parts, {})[tag[1:-1]] = chr(cp)
+    return forms, ligatures
+
+
+_FORMS, _LIGATURES = _presentation_forms()
+
+
+def _joins_forward(ch):
+    # Letters with an initial form connect to the following letter
+    return 'initial' in _FORMS.get(ch, {})
+
+
+def shape(text):
+    """
+    Arabic text in presentation forms (what the PDFs contain before NFKC), logical order.
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        prev = text[i - 1] if i else ''
+        joins_prev = _joins_forward(prev) and ch in _FORMS
+
+        ligature = _LIGATURES.get((ch, text[i + 1] if i + 1 < len(text) else ''))
+        if ligature:
+            out.append(ligature['final' if joins_prev else 'isolated'])
+            i += 2
+            continue
+
+        forms = _FORMS.get(ch)
+        if not forms:
+            out.append(ch)
+            i += 1
+            continue
+
+        nxt = text[i + 1] if i + 1 < len(text) else ''
+        joins_next = _joins_forward(ch) and nxt in _FORMS
+        if joins_prev and joins_next and 'medial' in forms:
+            out.append(forms['medial'])
+        elif joins_prev and 'final' in forms:
+            out.append(forms['final'])
+        elif joins_next and 'initial' in forms:
+            out.append(forms['initial'])
+        else:
+            out.append(forms.get('isolated', ch))
+        i += 1
+    return ''.join(out)
+
+
+def visual(text):
+    """
+    Shaped and reversed, the way RTL text comes out of the schedule PDFs.
+    """
+    return shape(text)[::-1]
+
+
+def build_pdf(pages, width=842, height=595, xobjects=False):
+    """
+    Minimal PDF writer. pages is a list of (texts, lines): texts are (x, y, size, text)
+    and lines (x0, y0, x1, y1). Text uses an Identity-H font with a ToUnicode map, so
+    any BMP character extracts as itself without embedding a font program.
+
+    With xobjects, each page's drawing goes into a form XObject and every page's own
+    content stream is the same "/X0 Do", as some PDF producers write them.
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    used = sorted({ord(c) >> 8 for texts, _ in pages for *_, text in texts for c in text}) or [0]
+    cmap = "\n".join(
+        ["/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+         "/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+         "1 begincodespacerange <0000> <FFFF> endcodespacerange",
+         f"{len(used)} beginbfrange"]
+        + [f"<{h:02X}00> <{h:02X}FF> <{h:02X}00>" for h in used]
+        + ["endbfrange", "endcmap CMapName currentdict /CMap defineresource pop end end"]
+    ).encode()
+
+    to_unicode = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(cmap), cmap))
+    descriptor = add(b"<< /Type /FontDescriptor /FontName /Synthetic /Flags 32 /FontBBox [0 -200 1000 800]"
+                     b" /ItalicAngle 0 /Ascent 800 /Descent -200 /CapHeight 700 /StemV 80 >>")
+    cid_font = add(b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /Synthetic"
+                   b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >>"
+                   b" /DW 500 /CIDToGIDMap /Identity /FontDescriptor %d 0 R >>" % descriptor)
+    font = add(b"<< /Type /Font /Subtype /Type0 /BaseFont /Synthetic /Encoding /Identity-H"
+               b" /DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (cid_font, to_unicode))
+    pages_id = add(b"")  # Filled in once the page ids are known
+
+    page_ids = []
+    for texts, lines in pages:
+        ops = [f"{x0} {y0} m {x1} {y1} l S" for x0, y0, x1, y1 in lines]
+        for x, y, size, text in texts:
+            glyphs = "".join(f"{ord(c):04X}" for c in text)
+            ops.append(f"BT /F1 {size} Tf {x} {y} Td <{glyphs}> Tj ET")
+        content = zlib.compress("\n".join(ops).encode())
+        resources = b"/Font << /F1 %d 0 R >>" % font
+        if xobjects:
+            form = add(b"<< /Type /XObject /Subtype /Form /BBox [0 0 %d %d] /Resources << %s >>"
+                       b" /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                       % (width, height, resources, len(content), content))
+            resources = b"/XObject << /X0 %d 0 R >>" % form
+            content = zlib.compress(b"q /X0 Do Q")
+        stream = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        page_ids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d]"
+                            b" /Resources << %s >> /Contents %d 0 R >>"
+                            % (pages_id, width, height, resources, stream)))
+
+    kids = b" ".join(b"%d 0 R" % p for p in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (num, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+FIRST_NAMES = ['احمد', 'محمد', 'علي', 'خالد', 'سامي', 'ليلى', 'هند', 'يوسف', 'عمر', 'رنا', 'سعاد', 'ماجد']
+LAST_NAMES = ['عماد', 'حسن', 'يونس', 'سالم', 'نصر', 'قاسم', 'جابر', 'عيسى', 'منصور', 'شريف']
+DAY_LETTERS = ['ح', 'ن', 'ث', 'ر', 'خ']
+# Spellings that only differ in a hamza, ta marbuta or alef maqsura (one name_key)
+SPELLING_VARIANTS = [('احمد', 'أحمد'), ('اسامه', 'أسامة'), ('فاطمه', 'فاطمة'), ('ليلى', 'ليلي')]
+
+
+def doctor_names(doctors, seed=0, spelling_variants=False):
+    """
+    Distinct lecturer names. With spelling_variants, every second one is the one
+    before it spelled differently (see SPELLING_VARIANTS): two entries to the PDF
+    parser, one person to name_key().
+    """
+    rnd = random.Random(seed)
+    names = [f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {i + 1}" for i in range(doctors)]
+    if spelling_variants:
+        for i in range(1, doctors, 2):
+            plain, variant = SPELLING_VARIANTS[(i // 2) % len(SPELLING_VARIANTS)]
+            last = rnd.choice(LAST_NAMES)
+            names[i - 1] = f"{plain} {last} {i}"
+            names[i] = f"{variant} {last} {i}"
+    return names
+
+
+def time_cell(rnd):
+    """
+    One timetable cell, in either of the two layouts seen in the faculty PDFs.
+    """
+    start = rnd.randrange(8 * 60, 16 * 60, 30)
+    end = start + rnd.choice([60, 75, 90, 120])
+    s, e = f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"
+    days = '-'.join(rnd.sample(DAY_LETTERS, rnd.randint(1, 2)))
+    if rnd.random() < 0.5:
+        return f"{s}_{e} , {shape(days)}"
+    return f"( {visual('وجاهي كامل')} , {shape(days)} ,{e}_{s} )"
+
+
+def doctors_pdf(pages=20, doctors=10, slots=6, seed=0, spelling_variants=False, xobjects=False):
+    """
+    Doctors schedule PDF: `pages` pages cycling through `doctors` lecturers,
+    `slots` timetable rows per page. spelling_variants as in doctor_names, xobjects
+    as in build_pdf.
+    """
+    rnd = random.Random(seed)
+    names = doctor_names(doctors, seed, spelling_variants)
+
+    out = []
+    for p in range(pages):
+        name = names[p % len(names)]
+        texts = [(250, 560, 10, visual(f"المحاضر : {name} الرتبة : استاذ مشارك"))]
+
+        xs = [40, 340, 420, 640, 800]
+        row_height = min(25, 480 // (slots + 1))
+        ys = [530 - row_height * i for i in range(slots + 2)]
+        lines = [(x, ys[0], x, ys[-1]) for x in xs] + [(xs[0], y, xs[-1], y) for y in ys]
+
+        for x, title in zip(xs, ['الوقت', 'الأيام', 'المادة', 'القاعة']):
+            texts.append((x + 6, ys[0] - row_height + 7, 8, visual(title)))
+        for r in range(slots):
+            y = ys[r + 1] - row_height + 7
+            texts.append((xs[0] + 6, y, 7, time_cell(rnd)))
+            texts.append((xs[2] + 6, y, 7, visual(f"مقرر {rnd.randint(100, 999)}")))
+            texts.append((xs[3] + 6, y, 7, str(rnd.randint(100, 130))))
+        out.append((texts, lines))
+
+    return build_pdf(out, xobjects=xobjects)
+
+
+def exam_time(rnd):
+    # 12-hour clock like the exam office uses: "11:00 - 1:00" is 11 AM to 1 PM
+    start = rnd.randrange(8 * 60, 15 * 60, 30)
+    end = start + rnd.choice([60, 90, 120])
+    fmt = lambda m: f"{(m // 60 - 1) % 12 + 1}:{m % 60:02d}"
+    return f"{fmt(start)} - {fmt(end)}"
+
+
+EXAM_HEADER = ['رمز المقرر', 'اسم المقرر', 'الشعبة', 'الوقت', 'موعد الامتحان', 'القاعة']
+
+
+def exam_dates(start_date, days):
+    """
+    The teaching days (Sun..Thu) among the `days` days from start_date, the only
+    days the real timetables have exams on.
+    """
+    dates = [start_date + datetime.timedelta(days=d) for d in range(days)]
+    return [d for d in dates if d.weekday() not in (4, 5)]  # No exams on Friday / Saturday
+
+
+def exam_rows(exams=50, seed=0, start_date=datetime.date(2025, 1, 5), days=14):
+    """
+    Cell texts of an exam timetable, header row first.
+    """
+    rnd = random.Random(seed)
+    dates = exam_dates(start_date, days)
+    rows = [EXAM_HEADER]
+    for i in range(exams):
+        date = rnd.choice(dates)
+        course = f"مقرر {rnd.randint(100, 999)}"
+        section = str(rnd.randint(1, 4))
+        rows.append([str(1000 + i), course, section, exam_time(rnd), date.strftime('%d/%m/%Y'),
+                     str(rnd.randint(100, 130))])
+    return rows
+
+
+def exams_docx(exams=50, seed=0, start_date=datetime.date(2025, 1, 5), days=14):
+    """
+    Exam timetable DOCX with one table of `exams` rows, written by python-docx.
+    """
+    import docx
+
+    document = docx.Document()
+    document.add_paragraph("برنامج الامتحانات النهائية")
+
+    rows = exam_rows(exams, seed, start_date, days)
+    table = document.add_table(rows=1, cols=len(rows[0]))
+    for cell, title in zip(table.rows[0].cells, rows[0]):
+        cell.text = title
+
+    for row in rows[1:]:
+        for cell, text in zip(table.add_row().cells, row):
+            cell.text = text
+
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+
+def build_docx(rows, title="برنامج الامتحانات النهائية"):
+    """
+    Bare-bones DOCX (stdlib only) with a title paragraph and one table of `rows`
+    (lists of cell texts). Enough for parse_exams_docx, not for Word's every feature.
+    """
+    from xml.sax.saxutils import escape
+
+    def paragraph(text):
+        return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    table = ''.join(
+        '<w:tr>' + ''.join(f'<w:tc>{paragraph(text)}</w:tc>' for text in row) + '</w:tr>'
+        for row in rows
+    )
+    document = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}"><w:body>{paragraph(title)}<w:tbl>{table}</w:tbl></w:body></w:document>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', content_types)
+        zf.writestr('_rels/.rels', rels)
+        zf.writestr('word/document.xml', document)
+    return out.getvalue()
+
+
+def doctors_dict(doctors=60, slots=12, seed=0):
+    """
+    parse_doctors_pdf-shaped schedule: {name: {"busy_slots": {"Sun": [("08:00", "09:30"), ...]}}}.
+    """
+    rnd = random.Random(seed)
+    days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu']
+    out = {}
+    for name in doctor_names(doctors, seed):
+        busy = {day: [] for day in days}
+        for _ in range(slots):
+            start = rnd.randrange(8 * 60, 16 * 60, 30)
+            end = start + rnd.choice([60, 75, 90, 120])
+            busy[rnd.choice(days)].append((f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"))
+        out[name] = {"busy_slots": busy}
+    return out
+
+
+def exam_dicts(exams=500, seed=0, start_date=datetime.date(2025, 1, 5), days=14, rooms=30):
+    """
+    parse_exams_docx-shaped exams, on weekdays from start_date.
+    """
+    rnd = random.Random(seed)
+    dates = exam_dates(start_date, days)
+
+    # Most exams sit in the standard periods, the rest start on any half hour
+    periods = [(8 * 60 + 30, 10 * 60 + 30), (11 * 60, 13 * 60), (13 * 60 + 30, 15 * 60 + 30)]
+
+    out = []
+    for i in range(exams):
+        if rnd.random() < 0.8:
+            start, end = rnd.choice(periods)
+        else:
+            start = rnd.randrange(8 * 60, 15 * 60, 30)
+            end = start + rnd.choice([60, 90, 120])
+        out.append({
+            "course_name": f"مقرر {rnd.randint(100, 999)}",
+            "raw_time": "",
+            "start": f"{start // 60:02d}:{start % 60:02d}",
+            "end": f"{end // 60:02d}:{end % 60:02d}",
+            "date": rnd.choice(dates).strftime('%d/%m/%Y'),
+            "day_of_week": None,
+            "room": str(100 + rnd.randrange(rooms)),
+            "section": str(rnd.randint(1, 4)),
+        })
+    return out
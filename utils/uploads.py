@@ -0,0 +1,59 @@
+import hashlib
+import io
+import tempfile
+
+# Uploads up to this size stay in memory, bigger ones roll over to an anonymous temp file
+SPOOL_THRESHOLD = 4 * 1024 * 1024
+
+_CHUNK = 64 * 1024
+
+
+class Upload:
+    """
+    An uploaded file held in memory (or a self-deleting temp file above the spool
+    threshold), with the SHA-256 of its contents computed while it was copied in.
+    Parsers take .file directly, nothing is written under a shared path.
+    """
+    __slots__ = ('file', 'digest', 'size', 'filename')
+
+    def __init__(self, file, digest, size, filename=""):
+        self.file = file
+        self.digest = digest
+        self.size = size
+        self.filename = filename
+
+    @classmethod
+    def from_stream(cls, stream, threshold=SPOOL_THRESHOLD, filename=""):
+        """
+        Copies a binary stream (e.g. request.files[...].stream) and hashes it in one pass.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=threshold)
+        h = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = stream.read(_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+            spool.write(chunk)
+            size += len(chunk)
+        spool.seek(0)
+        return cls(spool, h.hexdigest(), size, filename)
+
+    @classmethod
+    def from_bytes(cls, data, filename=""):
+        return cls(io.BytesIO(data), hashlib.sha256(data).hexdigest(), len(data), filename)
+
+    def read(self):
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+
+    def __reduce__(self):
+        # Process-pool jobs get a copy of the bytes, file objects can't be pickled
+        return (Upload.from_bytes, (self.read(), self.filename))
+
+    def __bool__(self):
+        return self.size > 0
@@ -0,0 +1,59 @@
+"""
+Warm-up for a fresh server process: runs a tiny synthetic schedule through every
+parse / match path, so the lazy imports (pdfplumber, pdfminer...), regex and font
+tables and Flask's templates are loaded before the first real request.
+
+gunicorn.conf.py calls warm_up() once in the master with preload_app, so every
+forked worker starts warm, or in each worker when preloading is off.
+"""
+import time
+
+from utils import metrics
+
+# Small enough to take well under a second, big enough to hit every code path
+SAMPLE_PAGES = 2
+SAMPLE_EXAMS = 6
+
+
+def warm_up(app=None):
+    """
+    Parses and matches the sample; with a Flask app, also renders its index page.
+    Nothing is written to the doctors store or the parse cache. Returns the seconds
+    taken per step.
+    """
+    from utils.assign import assign_proctors
+    from utils.availability import BusyIndex
+    from utils.conflicts import find_conflicts
+    from utils.freetime import FreeTimeTable
+    from utils.model import DoctorsDB
+    from utils.parser import parse_doctors_pdf, parse_exams_docx, check_availability
+    from utils.synthetic import doctors_pdf, build_docx, exam_rows
+
+    timings = {}
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - t0, 4)
+        return result
+
+    pdf_bytes = doctors_pdf(pages=SAMPLE_PAGES, doctors=SAMPLE_PAGES, slots=3)
+    docx_bytes = build_docx(exam_rows(SAMPLE_EXAMS))
+
+    doctors = step("pdf", lambda: parse_doctors_pdf(pdf_bytes))
+    exams = step("docx", lambda: parse_exams_docx(docx_bytes))
+    db = DoctorsDB.from_dict(doctors)
+    step("conflicts", lambda: find_conflicts(exams))
+    matches = step("match", lambda: check_availability(exams, db))
+    step("free_time", lambda: (FreeTimeTable(db), BusyIndex(db)))
+    step("assign", lambda: assign_proctors(matches))
+
+    if app is not None:
+        def render_index():
+            with app.test_client() as client:
+                client.get('/')
+        step("index", render_index)
+
+    # Don't let the sample show up in the served metrics
+    metrics.REGISTRY.clear()
+    return timings